@@ -0,0 +1,128 @@
+import numpy as np
+from level import Level
+
+# 向量化的敌人和子弹阶段 (Game(vectorized=True)):
+# 移动, 越界和 AABB 碰撞对所有实体一次性用数组算出. 什么都没碰到的实体直接写回新位置,
+# 可能碰到东西的实体 (宽检测, 只会多报不会漏报) 交给原来的对象代码按原顺序处理,
+# 所以结果和逐个对象更新完全一致.
+
+MAP_SIZE = 416
+DIR_STEPS = np.array([(0, -1), (1, 0), (0, 1), (-1, 0)], dtype=np.int32)  # up, right, down, left
+# terrain 值 -> 能不能挡住子弹, 只有砖和铁能
+BULLET_STOPPERS = np.zeros(256, dtype=bool)
+BULLET_STOPPERS[Level.TERRAIN_VALUES[[Level.TILE_BRICK, Level.TILE_STEEL]]] = True
+
+
+def rects(objects):
+	""" (n, 4) x, y, w, h of the objects' rects """
+	return np.array([tuple(o.rect) for o in objects], dtype=np.int32).reshape(-1, 4)
+
+
+def overlaps(a, b):
+	""" (n, m) matrix of pygame.Rect.colliderect between the rows of a (n, 4) and b (m, 4) """
+	return (
+		(a[:, None, 0] < b[None, :, 0] + b[None, :, 2]) & (a[:, None, 0] + a[:, None, 2] > b[None, :, 0]) &
+		(a[:, None, 1] < b[None, :, 1] + b[None, :, 3]) & (a[:, None, 1] + a[:, None, 3] > b[None, :, 1]))
+
+
+def out_of_map(r):
+	return (r[:, 0] < 0) | (r[:, 1] < 0) | (r[:, 0] > MAP_SIZE - r[:, 2]) | (r[:, 1] > MAP_SIZE - r[:, 3])
+
+
+def cells(r):
+	""" First/last column and row of the tiles under each rect, clipped to the map """
+	corners = np.concatenate([r[:, :2], r[:, :2] + r[:, 2:] - 1], axis=1) // Level.TILE_SIZE
+	np.minimum(np.maximum(corners, 0, out=corners), Level.MAP_TILES - 1, out=corners)
+	return corners[:, 0], corners[:, 2], corners[:, 1], corners[:, 3]
+
+
+def step_bullets(game):
+	""" The bullet phase of Game.step, same as updating every bullet in game.bullets
+	@return number of bullet.update() calls that returned True (enemy hits)
+	"""
+	bullets = game.bullets
+	if not bullets:
+		return 0
+	active = bullets[0].STATE_ACTIVE
+	info = np.array([(b.direction, b.speed, b.owner_side, b.state != active) for b in bullets], dtype=np.int32)
+	old = rects(bullets)
+	new = old.copy()
+	new[:, :2] += DIR_STEPS[info[:, 0]] * info[:, 1:2]
+
+	check = info[:, 3].astype(bool) | out_of_map(new)
+	# 砖和铁: 子弹的矩形最多跨 2x2 个格子. 本阶段只会打掉方块, 不会增加
+	c0, c1, r0, r1 = cells(new)
+	terrain = game.level.terrain
+	check |= BULLET_STOPPERS[terrain[r0, c0]] | BULLET_STOPPERS[terrain[r0, c1]]
+	check |= BULLET_STOPPERS[terrain[r1, c0]] | BULLET_STOPPERS[terrain[r1, c1]]
+	# 对方的子弹, 移动前后的位置都算上
+	sides = np.concatenate([info[:, 2], info[:, 2]])
+	check |= (overlaps(new, np.concatenate([old, new])) & (info[:, 2:3] != sides)).any(axis=1)
+	# 活着的坦克和基地
+	targets = [t for t in game.players + game.enemies if t.state == t.STATE_ALIVE]
+	if game.castle.active:
+		targets.append(game.castle)
+	if targets:
+		check |= overlaps(new, rects(targets)).any(axis=1)
+
+	# 和 `for bullet in game.bullets` 同样的顺序, 包括移除一颗子弹后跳过下一颗
+	check, new = check.tolist(), new.tolist()
+	hits, pos, removed = 0, 0, 0
+	while pos < len(bullets):
+		bullet, k = bullets[pos], pos + removed
+		if bullet.state == bullet.STATE_REMOVED:
+			del bullets[pos]
+			removed += 1
+		elif check[k]:
+			if bullet.update():
+				hits += 1
+		else:
+			bullet.rect.topleft = new[k][:2]
+		pos += 1
+	return hits
+
+
+def step_enemies(game, time_passed):
+	""" The enemy phase of Game.step, same as the per-enemy loop there """
+	enemies = game.enemies
+	if not enemies:
+		return
+	n = len(enemies)
+	alive_state = enemies[0].STATE_ALIVE
+	# 下一步的位置: path = (x, y, dx, dy, length), 第 k 步在 (x + k*dx, y + k*dy)
+	steps = np.array([
+		e.path[:4] + (e.path_pos,)
+		if e.state == alive_state and not e.paused and not e.paralised and e.path_pos < e.path[4] else (-1, -1, 0, 0, 0)
+		for e in enemies], dtype=np.int32)
+	old = rects(enemies)
+	new = old.copy()
+	new[:, :2] = steps[:, :2] + steps[:, 2:4] * steps[:, 4:5]
+
+	check = out_of_map(new)  # 不移动的敌人放在 (-1, -1), 也走原来的代码
+	# 地形: 和 Enemy.move 一样, 覆盖的格子和地图版本都没变才跳过
+	c0, c1, r0, r1 = cells(new)
+	free = np.array([getattr(e, "free_cells", None) or (-1,) * 5 for e in enemies], dtype=np.int64)
+	check |= (free[:, 0] != c0) | (free[:, 1] != c1) | (free[:, 2] != r0) | (free[:, 3] != r1) | (free[:, 4] != game.level.version)
+	# 其它敌人 (移动前后的位置), 玩家和奖励
+	if n > 1:
+		others = overlaps(new, np.concatenate([old, new]))
+		others[np.arange(n), np.arange(n)] = others[np.arange(n), n + np.arange(n)] = False
+		check |= others.any(axis=1)
+	check |= overlaps(new, rects(game.players + game.bonuses)).any(axis=1)
+
+	check, new = check.tolist(), new.tolist()
+	pos, removed = 0, 0
+	while pos < len(enemies):
+		enemy, k = enemies[pos], pos + removed
+		if enemy.state == enemy.STATE_DEAD and not game.game_over and game.active:
+			del enemies[pos]
+			removed += 1
+			if len(game.level.enemies_left) == 0 and len(enemies) == 0:
+				game.active = False
+				print("Stage "+str(game.stage)+" completed")
+		elif check[k]:
+			enemy.update(time_passed)
+		else:  # 活着, 没碰到任何东西: Tank.update 无事可做, move 只是沿路径走一步
+			enemy.path_pos += 1
+			enemy.rect.topleft = new[k][:2]
+		pos += 1
@@ -0,0 +1,186 @@
+""" Throughput benchmarks for the simulation and the training loop
+Usage: python bench.py [--out bench.json] [--only game,level] [--compare old.json]
+Every benchmark uses fixed seeds and scripted actions, results are written as JSON.
+Benchmarks that need torch (CatEnv, Agent.learn) are skipped when it is not installed.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+from game import Game
+from level import Level
+from replay import ReplayBuffer, FrameReplayBuffer, PrioritizedReplayBuffer
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+STATE_SIZE, FRAME_SIZE = 1377, 1352
+
+
+def scripted_actions(n, seed=0):
+    """ Fixed action sequence, each action is held for 1~8 steps like a player would """
+    rng = random.Random(seed)
+    actions = []
+    while len(actions) < n:
+        actions += [rng.choice([0, 0, 1, 2, 3, 4, 5])] * rng.randint(1, 8)
+    return actions[:n]
+
+
+def measure(fn, ops, repeat=3):
+    """ Best of repeat runs of fn(), which performs `ops` operations """
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return {"ops": ops, "seconds": best, "per_second": ops / best}
+
+
+def bench_game(mode, n_steps=3000, vectorized=False):
+    actions = scripted_actions(n_steps)
+
+    def run():
+        game = Game(render_mode=mode, headless=mode != "rgb", seed=0, vectorized=vectorized)
+        game.reset()
+        for action in actions:
+            _, _, done, truncated, _ = game.step(action)
+            if done or truncated:
+                game.reset()
+    return measure(run, n_steps)
+
+
+def bench_catenv(n_steps=1000, skips=3):
+    from model import CatEnv
+    actions = scripted_actions(n_steps)
+
+    def run():
+        env = CatEnv(Game(render_mode="grid", headless=True, seed=0), skips=skips)
+        env.reset()
+        for action in actions:
+            _, _, done, truncated, _ = env.step(action)
+            if done or truncated:
+                env.reset()
+    return measure(run, n_steps)
+
+
+def bench_level(n_levels=35):
+    game = Game(render_mode="grid", headless=True, seed=0)
+
+    def run():
+        for nr in range(1, n_levels + 1):
+            Level(game, nr)
+    return measure(run, n_levels)
+
+
+def fill(memory, n, seed=0):
+    """ Add n synthetic transitions that continue each other, episodes of 200 steps """
+    rng = np.random.default_rng(seed)
+    state = rng.integers(0, 64, STATE_SIZE).astype(np.float32)
+    for i in range(n):
+        next_state = rng.integers(0, 64, STATE_SIZE).astype(np.float32)
+        done = (i + 1) % 200 == 0
+        memory.add(state, i % 6, -0.1, next_state, done)
+        state = rng.integers(0, 64, STATE_SIZE).astype(np.float32) if done else next_state
+
+
+def bench_replay(kind, buffer_size=20000, batch_size=128, n_samples=500):
+    cls = {"uniform": ReplayBuffer, "frames": FrameReplayBuffer, "prioritized": PrioritizedReplayBuffer}[kind]
+    np.random.seed(0)
+    memory = cls(buffer_size, batch_size, STATE_SIZE, FRAME_SIZE)
+    fill(memory, buffer_size)
+
+    def run():
+        for _ in range(n_samples):
+            batch = memory.sample()
+            if kind == "prioritized":
+                memory.update_priorities(batch[-1], np.ones(batch_size, dtype=np.float32))
+    return measure(run, n_samples)
+
+
+def bench_learn(replay="uniform", n_updates=50, batch_size=128):
+    import train
+    train.device = torch.device("cpu")
+    torch.manual_seed(0)
+    np.random.seed(0)
+    agent = train.Agent(STATE_SIZE, 6, batch_size=batch_size, buffer_size=5000, replay=replay)
+    fill(agent.memory, 5000)
+
+    def run():
+        for _ in range(n_updates):
+            agent.learn()
+    return measure(run, n_updates)
+
+
+BENCHMARKS = {
+    "game.grid": lambda: bench_game("grid"),
+    "game.grid.vectorized": lambda: bench_game("grid", vectorized=True),
+    "game.feature": lambda: bench_game("feature"),
+    "game.rgb": lambda: bench_game("rgb", 1000),
+    "catenv": bench_catenv,
+    "level.load": bench_level,
+    "replay.uniform": lambda: bench_replay("uniform"),
+    "replay.frames": lambda: bench_replay("frames"),
+    "replay.prioritized": lambda: bench_replay("prioritized"),
+    "learn.uniform": bench_learn,
+}
+NEEDS_TORCH = {"catenv", "learn.uniform"}
+
+
+def run_benchmarks(names):
+    results = {}
+    for name in names:
+        if name in NEEDS_TORCH and torch is None:
+            results[name] = {"skipped": "torch is not installed"}
+            print(f"{name:<20} skipped (no torch)")
+            continue
+        random.seed(0)
+        results[name] = BENCHMARKS[name]()
+        print(f"{name:<20} {results[name]['per_second']:>12.1f} /s")
+    return results
+
+
+def compare(results, filename):
+    """ Print the speed ratio of every benchmark against an earlier result file """
+    with open(filename) as f:
+        old = json.load(f)["results"]
+    for name, result in results.items():
+        if "per_second" in result and "per_second" in old.get(name, {}):
+            ratio = result["per_second"] / old[name]["per_second"]
+            print(f"{name:<20} {ratio:>6.2f}x")
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", type=str, default="bench.json", help="JSON file to write the results to")
+    parser.add_argument("--only", type=str, default="", help="comma separated name prefixes, e.g. game,replay")
+    parser.add_argument("--compare", type=str, default=None, help="earlier result file to compare with")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    prefixes = [p for p in args.only.split(",") if p]
+    names = [n for n in BENCHMARKS if not prefixes or any(n.startswith(p) for p in prefixes)]
+
+    results = run_benchmarks(names)
+    meta = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "torch": torch.__version__ if torch is not None else None,
+    }
+    with open(args.out, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"results saved to {args.out}")
+    if args.compare:
+        compare(results, args.compare)
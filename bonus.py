@@ -1,5 +1,4 @@
 import pygame
-import random
 
 class Bonus():
 	""" Various power-ups
@@ -22,9 +21,9 @@ class Bonus():
 		self.level = level   # to know where to place
 		self.active = True   # bonus lives only for a limited period of time
 		self.visible = True  # blinking state
-		self.rect = pygame.Rect(random.randint(0, 416-32), random.randint(0, 416-32), 32, 32)
+		self.rect = pygame.Rect(self.game.rng.randint(0, 416-32), self.game.rng.randint(0, 416-32), 32, 32)
 
-		self.bonus = random.choice([
+		self.bonus = self.game.rng.choice([
 			self.BONUS_GRENADE,
 			self.BONUS_HELMET,
 			self.BONUS_SHOVEL,
@@ -33,12 +32,14 @@ class Bonus():
 			self.BONUS_TIMER
 		])
 
-		self.image = self.game.sprites.subsurface(16*2*self.bonus, 32*2, 16*2, 15*2)
+		self.image = None
+		if not game.headless:
+			self.image = game.atlas.bonuses[self.bonus]
 
 	def draw(self):
 		""" draw bonus """
 		if self.visible:
-			self.game.screen.blit(self.image, self.rect.topleft)
+			self.game.blit(self.image, self.rect.topleft)
 
 	def toggleVisibility(self):
 		""" Toggle bonus visibility """
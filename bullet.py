@@ -17,34 +17,28 @@ class Bullet():
 		# 1-regular everyday normal bullet
 		# 2-can destroy steel
 		self.power = 1
-		self.image = self.game.sprites.subsurface(75*2, 74*2, 3*2, 4*2)
+		self.image = None
+		if not self.game.headless:
+			self.image = self.game.atlas.bullet[direction]  # pre-rotated
 
 		# position is player's top left corner, so we'll need to
-		# recalculate a bit. also rotate image itself.
+		# recalculate a bit.
 		if direction == self.DIR_UP:
 			self.rect = pygame.Rect(position[0] + 11, position[1] - 8, 6, 8)
 		elif direction == self.DIR_RIGHT:
-			self.image = pygame.transform.rotate(self.image, 270)
 			self.rect = pygame.Rect(position[0] + 26, position[1] + 11, 8, 6)
 		elif direction == self.DIR_DOWN:
-			self.image = pygame.transform.rotate(self.image, 180)
 			self.rect = pygame.Rect(position[0] + 11, position[1] + 26, 6, 8)
 		elif direction == self.DIR_LEFT:
-			self.image = pygame.transform.rotate(self.image, 90)
 			self.rect = pygame.Rect(position[0] - 8 , position[1] + 11, 8, 6)
 
-		self.explosion_images = [
-			self.game.sprites.subsurface(0, 80*2, 32*2, 32*2),
-			self.game.sprites.subsurface(32*2, 80*2, 32*2, 32*2),
-		]
-
 		self.speed = speed
 		self.state = self.STATE_ACTIVE
 
 	def draw(self):
 		""" draw bullet """
 		if self.state == self.STATE_ACTIVE:
-			self.game.screen.blit(self.image, self.rect.topleft)
+			self.game.blit(self.image, self.rect.topleft)
 		elif self.state == self.STATE_EXPLODING:
 			self.explosion.draw()
 
@@ -84,12 +78,9 @@ class Bullet():
 
 		# check for collisions with walls. one bullet can destroy several (1 or 2)
 		# tiles but explosion remains 1
-		rects = self.level.obstacle_rects
-		collisions = self.rect.collidelistall(rects)
-		if collisions != []:
-			for i in collisions:
-				if self.level.hitTile(rects[i].topleft, self.power):
-					has_collided = True
+		for tile in self.level.obstacleTiles(self.rect):
+			if self.level.hitTile(tile.topleft, self.power):
+				has_collided = True
 		if has_collided:
 			self.explode()
 			return False
@@ -8,14 +8,17 @@ class Castle:
 	def __init__(self, game):
 		self.game = game
 		# images
-		self.img_undamaged = self.game.sprites.subsurface(0, 15*2, 16*2, 16*2)
-		self.img_destroyed = self.game.sprites.subsurface(16*2, 15*2, 16*2, 16*2)
+		if not game.headless:
+			self.img_undamaged = game.atlas.castle_undamaged
+			self.img_destroyed = game.atlas.castle_destroyed
+		else:
+			self.img_undamaged = self.img_destroyed = None
 		self.rect = pygame.Rect(12*16, 24*16, 32, 32)  # init position
 		self.rebuild()  # start with undamaged and shiny castle
 
 	def draw(self):
 		""" Draw castle """
-		self.game.screen.blit(self.image, self.rect.topleft)
+		self.game.blit(self.image, self.rect.topleft)
 
 		if self.state == self.STATE_EXPLODING:
 			if not self.explosion.active:
@@ -0,0 +1,127 @@
+import os
+
+import h5py
+import numpy as np
+from record import load_record, record_states
+
+
+class RecordDataset():
+    """ Streaming view over the tank-*.h5 recordings written by Game.save_record and the
+    compact tank-*.npz records written by Game.play (record.py)
+    Only the file index and the (small) action arrays are kept in memory, states are
+    read chunk by chunk, either by HDF5 slicing or from an uncompressed .npy sidecar
+    opened with np.memmap, so the dataset can be larger than RAM.
+    The grid states of a .npz record are re-simulated once into its sidecar.
+    """
+    def __init__(self, dirname="./game_cache", prefix="tank-", chunk_size=1024, memmap=False):
+        """
+        chunk_size: states read per HDF5/memmap access
+        memmap: decompress every recording once into <file>.states.npy and read from that
+        """
+        self.filenames = sorted(
+            os.path.join(dirname, f) for f in os.listdir(dirname)
+            if f.startswith(prefix) and (f.endswith(".h5") or f.endswith(".npz")))
+        self.chunk_size = chunk_size
+        self.memmap = memmap
+        self.lengths, self.actions = [], []
+        self.state_shape = None
+        for filename in self.filenames:
+            if filename.endswith(".npz"):
+                states = np.load(self._sidecar(filename), mmap_mode="r")
+                self.lengths.append(len(states))
+                self.actions.append(load_record(filename)["actions"].astype(np.int64))
+                self.state_shape = states.shape[1:]
+                continue
+            with h5py.File(filename, "r") as f:
+                self.lengths.append(len(f["states"]))
+                self.actions.append(np.array(f["actions"], dtype=np.int64))
+                self.state_shape = f["states"].shape[1:]
+        self.offsets = np.concatenate([[0], np.cumsum(self.lengths)]).astype(np.int64)
+        self.sources = {}  # file index -> open h5 dataset or memmap
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def _source(self, index):
+        """ Array-like states of one recording, opened on first use """
+        source = self.sources.get(index)
+        if source is None:
+            filename = self.filenames[index]
+            if self.memmap or filename.endswith(".npz"):
+                source = np.load(self._sidecar(filename), mmap_mode="r")
+            else:
+                source = h5py.File(filename, "r")["states"]
+            self.sources[index] = source
+        return source
+
+    def _sidecar(self, filename):
+        """ Uncompressed copy of the states next to the recording, written chunk by chunk """
+        path = os.path.splitext(filename)[0] + ".states.npy"
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(filename):
+            return path
+        if filename.endswith(".npz"):  # 紧凑录像没有画面, 重新模拟一遍
+            np.save(path + ".tmp.npy", record_states(filename)[0])
+            os.replace(path + ".tmp.npy", path)
+            return path
+        with h5py.File(filename, "r") as f:
+            states = f["states"]
+            out = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=np.uint8, shape=states.shape)
+            for start in range(0, len(states), self.chunk_size):
+                out[start:start + self.chunk_size] = states[start:start + self.chunk_size]
+            out.flush()
+            del out
+        os.replace(path + ".tmp", path)  # 写完再改名, 中断不会留下残缺的文件
+        return path
+
+    def read(self, index, start, stop):
+        """ (states, actions) of steps start:stop of recording index """
+        states = np.asarray(self._source(index)[start:stop], dtype=np.uint8)
+        return states, self.actions[index][start:stop]
+
+    def chunks(self, shuffle=True, rng=None):
+        """ (file index, start, stop) of every chunk, in random order if shuffle """
+        chunks = [
+            (i, start, min(start + self.chunk_size, n))
+            for i, n in enumerate(self.lengths) for start in range(0, n, self.chunk_size)
+        ]
+        if shuffle:
+            rng = rng or np.random.default_rng()
+            chunks = [chunks[k] for k in rng.permutation(len(chunks))]
+        return chunks
+
+    def batches(self, batch_size, shuffle=True, buffer_chunks=8, seed=None, drop_last=False):
+        """ Generator of (states, actions) minibatches over one epoch
+        Chunks are visited in random order and buffer_chunks of them are mixed before
+        batches are cut, so at most buffer_chunks * chunk_size states are in memory.
+        """
+        rng = np.random.default_rng(seed)
+        pending_states, pending_actions, n_pending = [], [], 0
+        chunks = self.chunks(shuffle, rng)
+        for k, chunk in enumerate(chunks):
+            states, actions = self.read(*chunk)
+            pending_states.append(states)
+            pending_actions.append(actions)
+            n_pending += len(states)
+            last = k == len(chunks) - 1
+            if len(pending_states) < buffer_chunks and not last:
+                continue
+
+            states, actions = np.concatenate(pending_states), np.concatenate(pending_actions)
+            if shuffle:
+                order = rng.permutation(len(states))
+                states, actions = states[order], actions[order]
+            n_full = len(states) // batch_size * batch_size
+            for start in range(0, n_full, batch_size):
+                yield states[start:start + batch_size], actions[start:start + batch_size]
+            # 不满一个 batch 的留到下一轮混合
+            pending_states, pending_actions = [states[n_full:]], [actions[n_full:]]
+            n_pending = len(states) - n_full
+
+        if n_pending > 0 and not drop_last:
+            yield pending_states[0], pending_actions[0]
+
+    def close(self):
+        for source in self.sources.values():
+            if isinstance(source, h5py.Dataset):
+                source.file.close()
+        self.sources.clear()
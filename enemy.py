@@ -1,5 +1,5 @@
 import pygame
-import random
+from functools import partial
 from tank import Tank
 from bonus import Bonus
 
@@ -28,42 +28,15 @@ class Enemy(Tank):
 
 		# 1 in 5 chance this will be bonus carrier, but only if no other tank is
 		# 携带奖励的闪烁坦克死亡后，地图上会刷出奖励
-		if random.randint(1, 5) == 1:
+		if self.game.rng.randint(1, 5) == 1:
 			self.bonus = True
 			for enemy in self.game.enemies:
 				if enemy.bonus:
 					self.bonus = False
 					break
 
-		image_rects = [
-			# (32*2, 0, 13*2, 15*2),
-			(32*2, 0, 13*2, 15*2),
-			(48*2, 0, 13*2, 15*2),
-			(64*2, 0, 13*2, 15*2),
-			(80*2, 0, 13*2, 15*2),
-			(32*2, 16*2, 13*2, 15*2),
-			(48*2, 16*2, 13*2, 15*2),
-			(64*2, 16*2, 13*2, 15*2),
-			(80*2, 16*2, 13*2, 15*2)
-		]
-		# game.sprites.subsurface
-		self.image = game.sprites.subsurface(image_rects[self.type])
-		self.image_up = self.image
-		self.image_left = pygame.transform.rotate(self.image, 90)
-		self.image_down = pygame.transform.rotate(self.image, 180)
-		self.image_right = pygame.transform.rotate(self.image, 270)
-
-		if self.bonus:  # 闪烁的敌人附带奖励
-			self.image1_up = self.image_up
-			self.image1_left = self.image_left
-			self.image1_down = self.image_down
-			self.image1_right = self.image_right
-
-			self.image2 = game.sprites.subsurface(image_rects[self.type+4])
-			self.image2_up = self.image2
-			self.image2_left = pygame.transform.rotate(self.image2, 90)
-			self.image2_down = pygame.transform.rotate(self.image2, 180)
-			self.image2_right = pygame.transform.rotate(self.image2, 270)
+		if not game.headless:
+			self.images = game.atlas.enemies[self.type][0]
 
 		self.rotate(self.direction, False)
 
@@ -74,32 +47,26 @@ class Enemy(Tank):
 				return
 			self.rect.topleft = pos
 
-		# list of map coords where tank should go next
+		# straight segment the tank follows: (x, y, dx, dy, length), path_pos steps done
 		self.path = self.generatePath(self.direction)
+		# (cell range, level.version) last checked free of obstacles
+		self.free_cells = None
 
 		# 1000 (1s) is duration between shots 自动射击间隔
-		self.timer_uuid_fire = self.game.timer_pool.add(1000, self.fire)
+		self.timer_id_fire = self.game.timer_pool.add(1000, self.fire)
 
 		# turn on flashing
-		if self.bonus:
-			self.timer_uuid_flash = self.game.timer_pool.add(200, self.toggleFlash)
+		if self.bonus and not game.headless:
+			self.timer_id_flash = self.game.timer_pool.add(200, self.toggleFlash)
 
 	def toggleFlash(self):
 		""" Toggle flash state """
-		if self.state not in (self.STATE_ALIVE, self.STATE_SPAWNING):
-			self.game.timer_pool.destroy(self.timer_uuid_flash)
+		# headless: 从有画面的快照恢复时可能带着这个计时器
+		if self.game.headless or self.state not in (self.STATE_ALIVE, self.STATE_SPAWNING):
+			self.game.timer_pool.destroy(self.timer_id_flash)
 			return
 		self.flash = not self.flash
-		if self.flash:
-			self.image_up = self.image2_up
-			self.image_right = self.image2_right
-			self.image_down = self.image2_down
-			self.image_left = self.image2_left
-		else:
-			self.image_up = self.image1_up
-			self.image_right = self.image1_right
-			self.image_down = self.image1_down
-			self.image_left = self.image1_left
+		self.images = self.game.atlas.enemies[self.type][int(self.flash)]
 		self.rotate(self.direction, fix_position=False)
 
 	def spawnBonus(self):
@@ -109,7 +76,7 @@ class Enemy(Tank):
 		bonus = Bonus(game=self.game, level=self.level)
 		self.game.bonuses.append(bonus)
 		self.game.timer_pool.add(500, bonus.toggleVisibility)
-		self.game.timer_pool.add(10000, lambda :self.game.remove_bonus(bonus), 1)
+		self.game.timer_pool.add(10000, partial(self.game.remove_bonus, bonus), 1)
 
 	def getFreeSpawningPosition(self):
 		""" 在左上，中上，右上三个地点随机选择空位, 若无空位则返回 False """
@@ -122,7 +89,7 @@ class Enemy(Tank):
 			[24 * self.level.TILE_SIZE + vertical_offset,  horizontal_offset]
 		]
 		# [[0*16+3,3], [12*16+3, 3], [24*16+3, 3]]
-		random.shuffle(available_positions)
+		self.game.rng.shuffle(available_positions)
 
 		for pos in available_positions:
 			enemy_rect = pygame.Rect(pos, [26, 26])
@@ -153,10 +120,12 @@ class Enemy(Tank):
 		if self.state != self.STATE_ALIVE or self.paused or self.paralised:
 			return
 
-		if self.path == []:
+		if self.path_pos >= self.path[4]:
 			self.path = self.generatePath(None, True)
 
-		new_position = self.path.pop(0)
+		x, y, dx, dy, length = self.path
+		new_position = [x + dx * self.path_pos, y + dy * self.path_pos]
+		self.path_pos += 1
 
 		# 越界检测
 		if self.direction == self.DIR_UP:
@@ -178,10 +147,14 @@ class Enemy(Tank):
 
 		new_rect = pygame.Rect(new_position, [26, 26])
 
-		# collisions with tiles
-		if new_rect.collidelist(self.level.obstacle_rects) != -1:
-			self.path = self.generatePath(self.direction, True)
-			return
+		# collisions with tiles, 结果只取决于覆盖的格子和地图, 没跨格子边界就不用重新检查
+		ts = self.level.TILE_SIZE
+		cells = (new_rect.left // ts, (new_rect.right - 1) // ts, new_rect.top // ts, (new_rect.bottom - 1) // ts, self.level.version)
+		if cells != self.free_cells:
+			if self.level.collideObstacle(new_rect):
+				self.path = self.generatePath(self.direction, True)
+				return
+			self.free_cells = cells
 
 		# collisions with other enemies
 		for enemy in self.game.enemies:
@@ -212,8 +185,15 @@ class Enemy(Tank):
 			self.move()
 
 	def generatePath(self, direction=None, fix_direction=False):
+		profiler = self.game.profiler
+		if profiler is not None:  # 嵌套在 enemies 阶段里单独计时
+			return profiler.call("enemies.generatePath", self._generatePath, direction, fix_direction)
+		return self._generatePath(direction, fix_direction)
+
+	def _generatePath(self, direction=None, fix_direction=False):
 		""" If direction is specified, try continue that way, otherwise choose at random
 		fis_direction: 是否允许方向修正
+		@return straight path segment (x, y, dx, dy, length), path_pos is reset to 0
 		"""
 		all_directions = [self.DIR_UP, self.DIR_RIGHT, self.DIR_DOWN, self.DIR_LEFT]
 
@@ -222,7 +202,7 @@ class Enemy(Tank):
 		directions = all_directions[:]
 		directions.remove(opposite_direction)
 
-		random.shuffle(directions)
+		self.game.rng.shuffle(directions)
 
 		if direction is not None:
 			directions.remove(direction)
@@ -241,22 +221,22 @@ class Enemy(Tank):
 		for direction in directions:
 			if direction == self.DIR_UP and y > 1:
 				new_pos_rect = self.rect.move(0, -8)
-				if new_pos_rect.collidelist(self.level.obstacle_rects) == -1:
+				if not self.level.collideObstacle(new_pos_rect):
 					new_direction = direction
 					break
 			elif direction == self.DIR_RIGHT and x < 24:
 				new_pos_rect = self.rect.move(8, 0)
-				if new_pos_rect.collidelist(self.level.obstacle_rects) == -1:
+				if not self.level.collideObstacle(new_pos_rect):
 					new_direction = direction
 					break
 			elif direction == self.DIR_DOWN and y < 24:
 				new_pos_rect = self.rect.move(0, 8)
-				if new_pos_rect.collidelist(self.level.obstacle_rects) == -1:
+				if not self.level.collideObstacle(new_pos_rect):
 					new_direction = direction
 					break
 			elif direction == self.DIR_LEFT and x > 1:
 				new_pos_rect = self.rect.move(-8, 0)
-				if new_pos_rect.collidelist(self.level.obstacle_rects) == -1:
+				if not self.level.collideObstacle(new_pos_rect):
 					new_direction = direction
 					break
 
@@ -271,8 +251,6 @@ class Enemy(Tank):
 
 		self.rotate(new_direction, fix_position=fix_direction)
 
-		positions = []
-
 		x = self.rect.left
 		y = self.rect.top
 
@@ -284,19 +262,9 @@ class Enemy(Tank):
 
 		# 以32像素的大格为单位, 随机走1~12步, 12步是地图宽度
 		# 加上 axis_fix, 3 修正偏移位置 (很难恰好被单位宽32整除)
-		pixels = self.nearest(random.randint(1, 12) * 32, 32) + axis_fix + 3
-
-		if new_direction == self.DIR_UP:  # 生成直线路径序列
-			for px in range(0, pixels, self.speed):
-				positions.append([x, y-px])
-		elif new_direction == self.DIR_RIGHT:
-			for px in range(0, pixels, self.speed):
-				positions.append([x+px, y])
-		elif new_direction == self.DIR_DOWN:
-			for px in range(0, pixels, self.speed):
-				positions.append([x, y+px])
-		elif new_direction == self.DIR_LEFT:
-			for px in range(0, pixels, self.speed):
-				positions.append([x-px, y])
-
-		return positions
\ No newline at end of file
+		pixels = self.nearest(self.game.rng.randint(1, 12) * 32, 32) + axis_fix + 3
+
+		# 直线路径只存起点, 每步位移和步数, 第 k 步在 (x + k*dx, y + k*dy)
+		dx, dy = ((0, -self.speed), (self.speed, 0), (0, self.speed), (-self.speed, 0))[new_direction]
+		self.path_pos = 0
+		return (x, y, dx, dy, len(range(0, pixels, self.speed)))
\ No newline at end of file
@@ -9,12 +9,10 @@ class Explosion():
 		if interval == None:
 			interval = 100
 
-		if images == None:
-			images = [
-				game.sprites.subsurface(0, 80*2, 32*2, 32*2),
-				game.sprites.subsurface(32*2, 80*2, 32*2, 32*2),
-				game.sprites.subsurface(64*2, 80*2, 32*2, 32*2)
-			]
+		if images == None and game.headless:
+			images = [None, None, None]  # 只保留帧数, 动画时长不变
+		elif images == None:
+			images = list(game.atlas.explosion)
 		
 		images.reverse()
 		self.images = [] + images
@@ -23,7 +21,7 @@ class Explosion():
 
 	def draw(self):
 		""" draw current explosion frame """
-		self.game.screen.blit(self.image, self.position)
+		self.game.blit(self.image, self.position)
 
 	def update(self):
 		""" Advace to the next image """
@@ -1,5 +1,7 @@
 import pygame
 import os, sys, random
+import io, pickle, copyreg
+from functools import partial
 import numpy as np
 from label import Label
 from castle import Castle
@@ -8,8 +10,64 @@ from enemy import Enemy
 from player import Player
 from level import Level
 from bullet import Bullet
+import sprites
+import state_arrays
+import array_engine
+from profiler import StepProfiler
 import utils
 
+
+def _snapshot_game():
+	""" Stands for the Game in a snapshot, replaced by the restoring game in Game.set_state """
+	raise pickle.UnpicklingError("game snapshots can only be loaded with Game.set_state")
+
+
+def _snapshot_atlas(key):
+	""" Stands for an atlas image or font in a snapshot """
+	raise pickle.UnpicklingError("game snapshots can only be loaded with Game.set_state")
+
+
+def _no_image(key):
+	""" Atlas references restored into a headless game, which has no images """
+	return None
+
+
+class _StatePickler(pickle.Pickler):
+	""" Pickles a game's simulation objects. The Game itself and atlas images/fonts are
+	written as references, so snapshots hold no pygame surfaces.
+	Uses dispatch_table (looked up in C by exact type) rather than persistent_id, which
+	would be a Python call for every pickled object """
+	def __init__(self, file, game):
+		super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+		self.game = game
+		self.dispatch_table = copyreg.dispatch_table.copy()
+		self.dispatch_table[Game] = self.reduce_game
+		self.dispatch_table[pygame.Surface] = self.reduce_atlas
+		self.dispatch_table[pygame.font.Font] = self.reduce_atlas
+
+	def reduce_game(self, game):
+		assert game is self.game, "snapshot refers to another Game"
+		return (_snapshot_game, ())
+
+	def reduce_atlas(self, obj):
+		key = self.game.atlas.ref(obj) if self.game.atlas is not None else None
+		assert key is not None, f"{obj} is not an atlas image and cannot be saved"
+		return (_snapshot_atlas, (key,))
+
+
+class _StateUnpickler(pickle.Unpickler):
+	def __init__(self, file, game):
+		super().__init__(file)
+		self.game = game
+
+	def find_class(self, module, name):
+		if module == __name__ and name == "_snapshot_game":
+			return lambda :self.game
+		if module == __name__ and name == "_snapshot_atlas":
+			return self.game.atlas.lookup if self.game.atlas is not None else _no_image
+		return super().find_class(module, name)
+
+
 class Game():
 	(DIR_UP, DIR_RIGHT, DIR_DOWN, DIR_LEFT) = range(4)
 	TILE_SIZE = 16
@@ -25,50 +83,80 @@ class Game():
 		(3,8,3,6), (6,4,2,8), (4,4,4,8), (0,10,4,6), (0,6,4,10)
 	)
 
-	def __init__(self, robot=True, full_screen=False, render_mode="rgb"):
+	def __init__(self, robot=True, full_screen=False, render_mode="rgb", headless=False, seed=None, profile=False, vectorized=False):
 		# render_mode: rgb, grid, feature
+		# headless: 不加载贴图和字体, 不创建任何 Surface, 只有 grid/feature 可用
+		# profile: 统计 step 各阶段耗时和实体数量, 结果在 info["profile"] 和 self.profiler.summary()
+		# vectorized: 敌人和子弹阶段用 array_engine 的数组版本, 结果完全相同. 实体很少时 numpy 的固定开销更大, 比默认慢 (见 bench.py)
+		# seed: 本局游戏随机数的种子, 每次 reset 的种子由它产生. None 时从全局 random 取, 所以 random.seed 仍然有效
+		assert not headless or (robot and render_mode != "rgb"), "headless mode needs robot=True and a grid/feature render_mode"
+		self.rng = random.Random(random.getrandbits(32) if seed is None else seed)  # all game randomness comes from here
+		self.seed = None  # seed of the current episode
+		self.profiler = StepProfiler() if profile else None  # 默认关闭, 见 profiler.py
+		self.vectorized = vectorized
 		self.sprites = None
+		self.atlas = None
 		self.timer_pool = utils.Timer()
 		self.robot = robot
 		self.render_mode = render_mode
+		self.headless = headless
 		size = width, height = 416, 416
 		self.size = size
+		self.clock = pygame.time.Clock()
+
+		# if true, no new enemies will be spawn during this time
+		# 时停使得新敌人暂时不生成
+		self.timefreeze = False
 
+		self.players = []
+		self.enemies = []
+		self.bullets = []
+		self.bonuses = []
+		self.labels = []
+
+		if not self.headless:
+			self.initGraphics()
+		self.castle = Castle(game=self)
+
+	def initGraphics(self):
+		""" Load sprites and font, create the screen """
+		size = width, height = self.size
 		pygame.init()
 
-		self.sprites = pygame.transform.scale(pygame.image.load("images/sprites.png"), [192, 224]) # tanks, effects
+		self.atlas = sprites.get_atlas()  # 进程内共享, 只加载一次
+		self.sprites = self.atlas.sheet  # tanks, effects
+
+		# rgb 观测: screen_buffer[y, x] 就是屏幕像素
+		# 32 位 RGBX 而不是 24 位 RGB, 两者的 alpha 混合舍入不同, 32 位与普通 Surface 完全一致
+		self.screen_pixels = np.zeros((height, width, 4), dtype=np.uint8)
+		self.screen_buffer = self.screen_pixels[..., :3]
+		self.gray_buffers = {}  # downsample -> (uint16 accumulator, uint16 temp, uint8 output)
 
 		if self.robot:
-			self.screen = pygame.Surface(size)
+			# the screen draws straight into screen_buffer, render() needs no copy
+			self.screen = pygame.image.frombuffer(self.screen_pixels, size, "RGBX")
 		else:  # human mode
 			# size = width, height = 480, 416
 			os.environ['SDL_VIDEO_WINDOW_POS'] = 'center'  # center window
 			pygame.display.set_caption("Battle City")
 			# self.screen = pygame.display.set_mode(size, pygame.FULLSCREEN)  # FULL SCREEN mode if needed
 			self.screen = pygame.display.set_mode(size)
-			pygame.display.set_icon(self.sprites.subsurface(0, 0, 13*2, 13*2))  # Yellow Tank
-
-		self.screen_buffer = np.zeros((width, height, 3), dtype=np.uint8)
-		self.clock = pygame.time.Clock()
+			pygame.display.set_icon(self.atlas.icon)  # Yellow Tank
 
-		# 裁剪贴图
-		self.enemy_life_image = self.sprites.subsurface(81*2, 57*2, 7*2, 7*2)
-		self.player_life_image = self.sprites.subsurface(89*2, 56*2, 7*2, 8*2)
-		self.flag_image = self.sprites.subsurface(64*2, 49*2, 16*2, 15*2)
+		# dirty-rect 渲染: 地形缓存在 terrain_surface, 每帧只重画实体所在区域
+		self.terrain_surface = pygame.Surface(size)
+		self.terrain_key = None  # (level, level.version) the cache was built from
+		self.grass_rects = []
+		self.draw_list = []   # (image, rect) blitted by entities this frame
+		self.last_rects = []  # entity rects of the previous frame
+		self.dirty_rects = []
 
-		# if true, no new enemies will be spawn during this time
-		# 时停使得新敌人暂时不生成
-		self.timefreeze = False
+		self.enemy_life_image = self.atlas.enemy_life
+		self.player_life_image = self.atlas.player_life
+		self.flag_image = self.atlas.flag
 
 		# load custom font
-		self.font = pygame.font.Font("fonts/prstart.ttf", 16)
-
-		self.players = []
-		self.enemies = []
-		self.bullets = []
-		self.bonuses = []
-		self.labels = []
-		self.castle = Castle(game=self)
+		self.font = self.atlas.font("fonts/prstart.ttf", 16)
 
 	def triggerBonus(self, bonus, player, reward=None):
 		""" Execute bonus powers 捡到地图上的奖励 """
@@ -87,7 +175,7 @@ class Game():
 			self.level.buildFortress(self.level.TILE_STEEL)
 			self.timer_pool.add(
 				interval=10000, 
-				callback=lambda :self.level.buildFortress(self.level.TILE_BRICK), 
+				callback=partial(self.level.buildFortress, self.level.TILE_BRICK),  # partial 而不是 lambda, 快照要能 pickle
 				repeat=1)
 		elif bonus.bonus == bonus.BONUS_STAR:    # 五角星
 			player.superpowers += 1
@@ -99,7 +187,7 @@ class Game():
 			self.toggleEnemyFreeze(True)
 			self.timer_pool.add(
 				interval=10000, 
-				callback=lambda :self.toggleEnemyFreeze(False), 
+				callback=partial(self.toggleEnemyFreeze, False),
 				repeat=1)
 		self.bonuses.remove(bonus)  # 从列表中移出处理完的奖励
 
@@ -119,11 +207,14 @@ class Game():
 		"""
 		player.shielded = shield
 		if shield:
-			player.timer_uuid_shield = self.timer_pool.add(100, callback=player.toggleShieldImage)
+			if not self.headless:  # 护盾闪烁动画
+				player.timer_id_shield = self.timer_pool.add(100, callback=player.toggleShieldImage)
+			else:
+				player.timer_id_shield = None
 			if duration != None:
-				self.timer_pool.add(duration, lambda :self.shieldPlayer(player, False), 1)
+				self.timer_pool.add(duration, partial(self.shieldPlayer, player, False), 1)
 		else:
-			self.timer_pool.destroy(player.timer_uuid_shield)
+			self.timer_pool.destroy(player.timer_id_shield)
 
 	def spawnEnemy(self):
 		""" Spawn new enemy if needed
@@ -172,19 +263,50 @@ class Game():
 			player.lives = 3
 			self.respawnPlayer(player, True)
 
+	def blit(self, image, position):
+		""" Entities draw through here, the image is composed onto the screen by draw() """
+		self.draw_list.append((image, image.get_rect(topleft=position)))
+
+	def updateTerrain(self):
+		""" Redraw the cached terrain layer (everything under the entities) """
+		level = self.level
+		self.terrain_surface.fill([0, 0, 0])
+		level.draw([level.TILE_EMPTY, level.TILE_BRICK, level.TILE_STEEL, level.TILE_FROZE, level.TILE_WATER], self.terrain_surface)
+		self.grass_rects = [tile for tile in level.mapr if tile.type == level.TILE_GRASS]
+		self.terrain_key = (level, level.version)
+
 	def draw(self):
-		self.screen.fill([0, 0, 0])
-		self.level.draw([self.level.TILE_EMPTY, self.level.TILE_BRICK, self.level.TILE_STEEL, self.level.TILE_FROZE, self.level.TILE_WATER])
+		""" Draw the frame. Only the regions covered by entities in this or the previous
+		frame are redrawn, unless the map changed. self.dirty_rects holds the updated regions
+		"""
+		assert not self.headless, "draw() is not available in headless mode"
+		self.draw_list = []
 		self.castle.draw()
-
 		for obj in self.enemies + self.labels + self.players + self.bullets + self.bonuses:
 			obj.draw()
+		rects = [rect for _, rect in self.draw_list]
 
-		self.level.draw([self.level.TILE_GRASS])
+		if self.terrain_key != (self.level, self.level.version):
+			self.updateTerrain()
+			dirty = [self.screen.get_rect()]
+		else:
+			dirty = self.last_rects + rects
+
+		grass = self.level.tiles[self.level.TILE_GRASS]
+		for area in dirty:
+			self.screen.set_clip(area)
+			self.screen.blit(self.terrain_surface, area, area)
+			for i in area.collidelistall(rects):
+				self.screen.blit(*self.draw_list[i])
+			for i in area.collidelistall(self.grass_rects):  # 草地盖在坦克上面
+				self.screen.blit(grass, self.grass_rects[i].topleft)
+		self.screen.set_clip(None)
+		self.last_rects = rects
+		self.dirty_rects = dirty
 
 		# self.drawSidebar()
 		if not self.robot:
-			pygame.display.flip()  # Update the full display Surface to the screen
+			pygame.display.update(dirty)  # Update the changed parts of the display Surface
 
 	def safe_update(self, screen, x, y, value):
 		x, y = max(x, 0), max(y, 0)
@@ -210,23 +332,12 @@ class Game():
 		"""简化版绘图26*26(一维), 用于加速验证RL算法"""
 		# GROUND = 0
 		PLAYER_HEAD, ENEMY_HEAD = 120, 90
-		# type: value, 砖: 5, 铁: 6, 水: 7
-		BRICK, STEEL, WATER = 21, 26, 30
 		PLAYER_BULLET_1, PLAYER_BULLET_2 = 244, 245
 		ENEMY_BULLET_1, ENEMY_BULLET_2 = 254, 255
 		# MAX = 255
 
-		screen = np.zeros((26, 26), dtype=np.uint8)
-		for tile in self.level.mapr:
-			x, y = tile.topleft
-			# 方块以16像素为单位
-			col, row = int(round(x/16)), int(round(y/16))
-			if tile.type == self.level.TILE_BRICK:
-				screen[row, col] = BRICK
-			elif tile.type == self.level.TILE_STEEL:
-				screen[row, col] = STEEL
-			elif tile.type == self.level.TILE_WATER:
-				screen[row, col] = WATER
+		# 砖, 铁, 水 已经在 level.terrain 里, 地形只在方块被打掉或修建堡垒时变化
+		screen = self.level.terrain.copy()
 
 		for b in self.bonuses:
 			x, y = b.rect.topleft
@@ -260,37 +371,123 @@ class Game():
 				self.safe_update(screen, row+1, col, t1)
 		return screen
 
-	def render(self):
+	# get_state/set_state 保存的属性, 其余 (screen, atlas, profiler ...) 属于显示和工具
+	STATE_FIELDS = (
+		"players", "enemies", "bullets", "bonuses", "labels", "castle", "level", "timer_pool",
+		"rng", "seed", "stage", "superpowers", "timefreeze", "game_over", "running", "active"
+	)
+
+	# 快照的第一个字节: 是否来自 headless 游戏, 在反序列化之前检查
+	SNAPSHOT_HEADLESS, SNAPSHOT_RENDERED = b"H", b"R"
+
+	def get_state(self):
+		""" Snapshot of the whole simulation (entities, timers, level tiles, RNG) as bytes
+		Restore it with set_state() on this or another Game. Snapshots of rendered games
+		can also be restored into headless games (images are dropped), not the other way round
+		"""
+		state = {name: self.__dict__[name] for name in self.STATE_FIELDS if name in self.__dict__}
+		buffer = io.BytesIO()
+		buffer.write(self.SNAPSHOT_HEADLESS if self.headless else self.SNAPSHOT_RENDERED)
+		_StatePickler(buffer, self).dump(state)
+		return buffer.getvalue()
+
+	def set_state(self, data):
+		""" Continue from a get_state() snapshot """
+		kind = data[:1]
+		if kind not in (self.SNAPSHOT_HEADLESS, self.SNAPSHOT_RENDERED):
+			raise ValueError("not a Game.get_state() snapshot")
+		if kind == self.SNAPSHOT_HEADLESS and not self.headless:
+			raise ValueError("a headless snapshot has no images and can only be restored into a headless game")
+		buffer = io.BytesIO(data)
+		buffer.seek(1)
+		self.__dict__.update(_StateUnpickler(buffer, self).load())
+
+	def clone(self):
+		""" Independent robot-mode copy of this game at the current step """
+		game = Game(robot=True, render_mode=self.render_mode, headless=self.headless, seed=0)
+		game.set_state(self.get_state())
+		return game
+
+	def world_arrays(self):
+		""" Simulation state as structured NumPy arrays (see state_arrays.py), no pygame objects """
+		return state_arrays.world_arrays(self)
+
+	def render(self, downsample=1, grayscale=False):
+		""" rgb frame, shape (h, w, 3), as a view of the screen pixels
+		The view is overwritten by the next render, copy it to keep a frame.
+		downsample: keep every n-th pixel along both axes, still a view
+		grayscale: (h, w) uint8 luminance, computed into a buffer reused across frames
+		"""
+		assert not self.headless, "rgb render is not available in headless mode"
 		self.draw()
-		pygame.pixelcopy.surface_to_array(self.screen_buffer, self.screen)
-		return self.screen_buffer.transpose((1,0,2)) # "rgb"
+		if not self.robot:  # 窗口模式的 screen 是显示表面, 只能拷贝变化的区域
+			pixels = self.screen_buffer.transpose((1,0,2))
+			bounds = self.screen.get_rect()
+			for area in self.dirty_rects:
+				area = area.clip(bounds)
+				if area.width and area.height:
+					pygame.pixelcopy.surface_to_array(
+						pixels[area.left:area.right, area.top:area.bottom], self.screen.subsurface(area))
+
+		frame = self.screen_buffer
+		if downsample > 1:
+			frame = frame[::downsample, ::downsample]
+		if grayscale:
+			frame = self.grayscale(frame, downsample)
+		return frame
+
+	def grayscale(self, frame, key):
+		""" ITU-R 601 luminance with integer weights, (77 R + 150 G + 29 B) >> 8 """
+		buffers = self.gray_buffers.get(key)
+		if buffers is None:
+			shape = frame.shape[:2]
+			buffers = (np.empty(shape, np.uint16), np.empty(shape, np.uint16), np.empty(shape, np.uint8))
+			self.gray_buffers[key] = buffers
+		acc, tmp, out = buffers
+		np.multiply(frame[..., 0], 77, out=acc, dtype=np.uint16)
+		np.multiply(frame[..., 1], 150, out=tmp, dtype=np.uint16)
+		acc += tmp
+		np.multiply(frame[..., 2], 29, out=tmp, dtype=np.uint16)
+		acc += tmp
+		np.right_shift(acc, 8, out=out, casting="unsafe")
+		return out
 
 	def feature(self):
-		player = self.players[0]
-		direction = [0] *4
-		direction[player.direction] = 1
-		p_bullet_pos = [[0, 0]]
-		can_fire = True
-		e_bullets = []
-		for b in self.bullets:
-			if b.owner_side == Bullet.OWNER_ENEMY:
-				e_bullets.append(b)
-			elif b.owner == player and b.state == Bullet.STATE_ACTIVE:
-				can_fire = False
-				p_bullet_pos = utils.get_relative_polar_coordinates(
-					player.rect.topleft, [b.rect.topleft])
-
-		enemy_polars = utils.get_relative_polar_coordinates(
-			player.rect.topleft, [e.rect.topleft for e in self.enemies], required_size=4)
-		e_bullet_polars = utils.get_relative_polar_coordinates(
-			player.rect.topleft, [b.rect.topleft for b in e_bullets], required_size=4)
-		castle_ploar = utils.get_relative_polar_coordinates(
-			player.rect.topleft, [self.castle.rect.topleft])
-
-		result = [can_fire] + direction + p_bullet_pos[0] +\
-			[p[0] for p in enemy_polars] + [p[0] for p in e_bullet_polars] + \
-			[p[1] for p in enemy_polars] + [p[1] for p in e_bullet_polars] + castle_ploar[0]
-		return np.array(result)
+		""" 25 个手工特征: 能否开火, 方向 one-hot, 自己子弹/敌人/敌方子弹/基地的相对极坐标 """
+		return self.batch_feature([self])[0]
+
+	# batch_feature 输出中 r/phi 的列顺序: 自己的子弹, 敌人 r, 敌方子弹 r, 敌人 phi, 敌方子弹 phi, 基地
+	POLAR_COLUMNS = np.array([0, 10] + list(range(1, 9)) + list(range(11, 19)) + [9, 19])
+
+	@staticmethod
+	def batch_feature(games):
+		""" feature() of several games in one pass, shape (len(games), 25) """
+		heads, origins, points = [], [], []
+		for game in games:
+			player = game.players[0]
+			origin = player.rect.topleft
+			head = [1, 0, 0, 0, 0]  # can_fire + direction one-hot
+			head[1 + player.direction] = 1
+			# 0 自己的子弹, 1~4 敌人, 5~8 敌方子弹, 9 基地
+			# 空位填玩家自己的坐标, 相对极坐标正好是 (0, 0)
+			own_bullet, e_bullets = origin, []
+			for b in game.bullets:
+				if b.owner_side == Bullet.OWNER_ENEMY:
+					e_bullets.append(b.rect.topleft)
+				elif b.owner == player and b.state == Bullet.STATE_ACTIVE:
+					head[0] = 0
+					own_bullet = b.rect.topleft
+			enemies = [e.rect.topleft for e in game.enemies[:4]]
+			e_bullets = e_bullets[:4]
+			points.append(
+				[own_bullet] + enemies + [origin]*(4-len(enemies)) +
+				e_bullets + [origin]*(4-len(e_bullets)) + [game.castle.rect.topleft])
+			origins.append(origin)
+			heads.append(head)
+
+		r, phi = utils.relative_polar(origins, points)
+		polars = np.concatenate([r, phi], axis=1)
+		return np.concatenate([np.array(heads, dtype=np.float64), polars[:, Game.POLAR_COLUMNS]], axis=1)
 
 	def toggleEnemyFreeze(self, freeze=True):
 		""" Freeze/defreeze all enemies """
@@ -298,14 +495,19 @@ class Game():
 			enemy.paused = freeze
 		self.timefreeze = freeze
 
-	def reset(self, stage=1):
-		""" Start next level. 下面会进入while循环 """
+	def reset(self, stage=1, seed=None):
+		""" Start next level. 下面会进入while循环
+		seed: episode seed, drawn from self.rng if None. The same seed, stage and
+		sequence of step() calls always replays the same episode (see record.py)
+		"""
+		self.seed = self.rng.getrandbits(32) if seed is None else seed
+		self.rng.seed(self.seed)
 		self.castle.rebuild()
 		del self.bullets[:]
 		del self.enemies[:]
 		del self.bonuses[:]
 		del self.labels[:]
-		del self.timer_pool.timers[:]
+		self.timer_pool.clear()
 
 		# load level
 		self.stage = min(stage%36, 1)
@@ -313,7 +515,7 @@ class Game():
 
 		enemies_l = self.levels_enemies[self.stage - 1]
 		self.level.enemies_left = [0]*enemies_l[0] + [1]*enemies_l[1] + [2]*enemies_l[2] + [3]*enemies_l[3]
-		random.shuffle(self.level.enemies_left)
+		self.rng.shuffle(self.level.enemies_left)
 
 		self.reloadPlayers()
 		self.timer_pool.add(3000, self.spawnEnemy) 
@@ -335,6 +537,10 @@ class Game():
 		# 0: fire, 1~4: move, 5: idle
 		# framerate=30
 
+		profiler = self.profiler
+		if profiler is not None:
+			t = profiler.begin()
+
 		reward = -0.1
 		player = self.players[0]
 		if player.state == player.STATE_ALIVE and not self.game_over and self.active:
@@ -349,15 +555,22 @@ class Game():
 			elif action == 4:
 				player.move(self.DIR_LEFT)
 		player.update(time_passed)
+		if profiler is not None:
+			t = profiler.lap("player", t)
 
-		for enemy in self.enemies:
-			if enemy.state == enemy.STATE_DEAD and not self.game_over and self.active:
-				self.enemies.remove(enemy)
-				if len(self.level.enemies_left) == 0 and len(self.enemies) == 0:
-					self.active = False
-					print("Stage "+str(self.stage)+" completed")
-			else:
-				enemy.update(time_passed)
+		if self.vectorized:
+			array_engine.step_enemies(self, time_passed)
+		else:
+			for enemy in self.enemies:
+				if enemy.state == enemy.STATE_DEAD and not self.game_over and self.active:
+					self.enemies.remove(enemy)
+					if len(self.level.enemies_left) == 0 and len(self.enemies) == 0:
+						self.active = False
+						print("Stage "+str(self.stage)+" completed")
+				else:
+					enemy.update(time_passed)
+		if profiler is not None:
+			t = profiler.lap("enemies", t)
 
 		if not self.game_over and self.active:
 			if player.state == player.STATE_ALIVE:
@@ -375,13 +588,20 @@ class Game():
 				else:
 					self.game_over = True
 
-		for bullet in self.bullets:  # 移除被标记为 REMOVED 的子弹
-			if bullet.state == bullet.STATE_REMOVED:
-				self.bullets.remove(bullet)
-			else:
-				if bullet.update():
-					reward += 100
-				
+		if profiler is not None:
+			t = profiler.lap("rules", t)
+		if self.vectorized:
+			reward += 100 * array_engine.step_bullets(self)
+		else:
+			for bullet in self.bullets:  # 移除被标记为 REMOVED 的子弹
+				if bullet.state == bullet.STATE_REMOVED:
+					self.bullets.remove(bullet)
+				else:
+					if bullet.update():
+						reward += 100
+		if profiler is not None:
+			t = profiler.lap("bullets", t)
+
 		for bonus in self.bonuses:  # 移除超时的奖励
 			if bonus.active == False:
 				self.bonuses.remove(bonus)
@@ -395,19 +615,27 @@ class Game():
 				self.game_over = True
 				reward -= 100
 
+		if profiler is not None:
+			t = profiler.lap("cleanup", t)
 		self.timer_pool.update(time_passed)  # 计时器心跳
+		if profiler is not None:
+			t = profiler.lap("timers", t)
 
-		# self.draw()
-		# pygame.pixelcopy.surface_to_array(self.screen_buffer, self.screen)
 		done = self.game_over 
 		truncated = not self.active
-		# return self.screen_buffer.transpose((1,0,2)), reward, done
 		if self.render_mode == "grid":
-			return self.simple_render(), reward, done, truncated, {}
+			obs = self.simple_render()
 		elif self.render_mode == "feature":
-			return self.feature(), reward, done, truncated, {}
+			obs = self.feature()
 		else:
-			return self.render(), reward, done, truncated, {}
+			obs = self.render()
+		info = {}
+		if profiler is not None:
+			profiler.lap("observation", t)
+			profiler.count(enemies=len(self.enemies), bullets=len(self.bullets),
+				bonuses=len(self.bonuses), tiles=len(self.level.tile_map), timers=len(self.timer_pool.timers))
+			info["profile"] = profiler.info()
+		return obs, reward, done, truncated, info
 
 	def save_record(self, stage, states, actions):
 		import h5py
@@ -419,21 +647,38 @@ class Game():
 		print(f"{len(states)} states saved to {filename}")
 	
 	def load_record(self, dirname="./game_cache", prefix="tank-"):
-		filenames = [f for f in os.listdir(dirname) if f.startswith(prefix)]
+		""" Load every h5 recording and compact .npz record fully into memory,
+		see dataset.RecordDataset for streaming. States of .npz records are re-simulated
+		"""
+		import h5py
+		from record import record_states
+		filenames = sorted(
+			f for f in os.listdir(dirname) if f.startswith(prefix) and (f.endswith(".h5") or f.endswith(".npz")))
 		states, actions = [], []
 		for filename in filenames:
-			with h5py.File(filename, 'r') as f:
+			if filename.endswith(".npz"):
+				states_, actions_ = record_states(os.path.join(dirname, filename))
+				states.append(states_)
+				actions.append(actions_)
+				continue
+			with h5py.File(os.path.join(dirname, filename), 'r') as f:
 				states_ = np.array(f['states'], dtype=np.uint8)
 				actions_ = np.array(f['actions'])
 			states.append(states_)
 			actions.append(actions_)
 		return states, actions
 
-	def play(self):
+	def play(self, compact=True):
+		""" Human play. The session is saved to ./game_cache
+		compact: save a replayable action log (record.py) instead of every state
+		"""
 		assert self.robot == False, "user_mode requires an Game object with robot=False"
+		from record import GameRecorder
 
 		states, actions = [], []
+		recorder = GameRecorder(self)
 		self.reset()  # 第一帧丢弃
+		recorder.start()
 		self.draw()
 		active = True
 		fire = False
@@ -474,11 +719,17 @@ class Game():
 				action = 5
 
 			state, reward, done, truncated, info = self.step(action, time_passed=time_passed)
+			recorder.add(action, time_passed)
+			if not compact:
+				states.append(state)
+				actions.append(action)
 			if not self.active:
 				self.reset()
-			states.append(state)
-			actions.append(action)
+				recorder.start()
 			self.draw()
-		self.save_record(self.stage, states, actions)
+		if compact:
+			recorder.save(f"./game_cache/tank-{self.stage}-{len(recorder)}.npz")
+		else:
+			self.save_record(self.stage, states, actions)
 
 
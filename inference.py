@@ -0,0 +1,80 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import torch
+
+
+class InferenceServer():
+    """ Collects act() requests from many threads and answers them with one batched forward pass
+    A batch is run as soon as max_batch_size requests are waiting, or max_wait_ms after
+    the first request of the batch arrived.
+    """
+    def __init__(self, qnet, device, max_batch_size=64, max_wait_ms=2.0):
+        self.qnet = qnet
+        self.qnet.eval()
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.n_batches, self.n_requests = 0, 0  # 统计平均 batch 大小
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def submit(self, state):
+        """ Queue one observation, returns a Future that resolves to the greedy action """
+        future = Future()
+        self.requests.put((np.asarray(state, dtype=np.float32), future))
+        return future
+
+    def act(self, state, eps=None):
+        """ Blocking version of submit, same signature as TestAgent.act """
+        return self.submit(state).result()
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+
+    def _collect(self):
+        """ Wait for a first request, then for more until the batch is full or the wait is over
+        @return (batch, stop)
+        """
+        item = self.requests.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _serve(self):
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            if not batch:
+                continue
+            states, futures = zip(*batch)
+            try:
+                states = torch.from_numpy(np.stack(states)).to(self.device)
+                with torch.no_grad():
+                    actions = self.qnet(states).argmax(dim=-1).cpu().numpy()
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, action in zip(futures, actions):
+                future.set_result(int(action))
+            self.n_batches += 1
+            self.n_requests += len(batch)
@@ -1,20 +1,19 @@
-import pygame
-
-
 class Label():
 	def __init__(self, game, position, text="", duration=None):
 		self.game = game
 		self.position = position
 		self.active = True
 		self.text = text
-		self.font = pygame.font.SysFont("Arial", 13)
+		self.font = None
+		if not game.headless:
+			self.font = game.atlas.font("Arial", 13)  # SysFont 查找很慢, 全局共享一个
 
 		if duration != None:  # 定时消失
 			self.game.timer_pool.add(duration, self.destroy, 1)
 
 	def draw(self):
 		""" draw label """
-		self.game.screen.blit(
+		self.game.blit(
 			self.font.render(
 				self.text, False, (200,200,200)   # text, antialias, color
 			), 
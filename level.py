@@ -1,12 +1,16 @@
 import os
 
-import pygame
+import numpy as np
 from utils import myRect
 
 class Level():
 	# tile constants
 	(TILE_EMPTY, TILE_BRICK, TILE_STEEL, TILE_WATER, TILE_GRASS, TILE_FROZE) = range(6)
 	TILE_SIZE = 16  # tile width/height in px
+	MAP_TILES = 26  # map is 26x26 tiles
+	OBSTACLE_TILES = (TILE_BRICK, TILE_STEEL, TILE_WATER)  # tanks cannot move over
+	# 简化版画面中各类方块的取值, 按 tile type 索引. 砖: 21, 铁: 26, 水: 30, 其余为地面 0
+	TERRAIN_VALUES = np.array([0, 21, 26, 30, 0, 0], dtype=np.uint8)
 	char2tile = {
 		"#": TILE_BRICK,
 		"@": TILE_STEEL,
@@ -24,43 +28,86 @@ class Level():
 		self.max_active_enemies = 4
 
 		self.current_water = 0
-		self.tile_water1 = game.sprites.subsurface(64*2, 64*2, 8*2, 8*2)
-		self.tile_water2 = game.sprites.subsurface(72*2, 64*2, 8*2, 8*2)
-
-		self.tiles = {
-			self.TILE_EMPTY: pygame.Surface((8*2, 8*2)),
-			self.TILE_BRICK: game.sprites.subsurface(48*2, 64*2, 8*2, 8*2),
-			self.TILE_STEEL: game.sprites.subsurface(48*2, 72*2, 8*2, 8*2),
-			self.TILE_GRASS: game.sprites.subsurface(56*2, 72*2, 8*2, 8*2),
-			self.TILE_WATER: self.tile_water1,
-			self.TILE_FROZE: game.sprites.subsurface(64*2, 72*2, 8*2, 8*2)
-		}
-
+		self.tiles = {}
+		if not game.headless:
+			tiles = game.atlas.tiles
+			self.tile_water1 = tiles["water1"]
+			self.tile_water2 = tiles["water2"]
+
+			self.tiles = {
+				self.TILE_EMPTY: tiles["empty"],
+				self.TILE_BRICK: tiles["brick"],
+				self.TILE_STEEL: tiles["steel"],
+				self.TILE_GRASS: tiles["grass"],
+				self.TILE_WATER: self.tile_water1,
+				self.TILE_FROZE: tiles["froze"]
+			}
+
+		# grid[row, col] 是格子类型, tile_map[(x, y)] 是左上角坐标对应的方块, 两者同步更新
+		self.grid = np.zeros((self.MAP_TILES, self.MAP_TILES), dtype=np.uint8)
+		self.tile_map = {}
+		self.terrain = np.zeros((self.MAP_TILES, self.MAP_TILES), dtype=np.uint8)  # static layer of simple_render
+		self.version = 0  # 每次地图块变化加一, 渲染缓存据此失效
 		self.loadLevel(level_nr)
-		self.obstacle_rects = []    # tiles' rects on map, tanks cannot move over
-		self.updateObstacleRects()  # update these tiles
 
 		# self.game.timer_pool.add(400, lambda :self.toggleWaves())  暂时取消河流动效，后面要再加回来
 
+	@property
+	def mapr(self):
+		""" All tiles on map as a list of myRect """
+		return list(self.tile_map.values())
+
+	def setTile(self, pos, tile_type):
+		""" Put a tile with its top left corner at pos (px), replacing any tile there """
+		col, row = pos[0] // self.TILE_SIZE, pos[1] // self.TILE_SIZE
+		self.grid[row, col] = tile_type
+		self.terrain[row, col] = self.TERRAIN_VALUES[tile_type]
+		self.tile_map[pos] = tileRect(pos[0], pos[1], tile_type)
+		self.version += 1
+
+	def removeTile(self, pos):
+		""" Remove the tile at pos (px) """
+		col, row = pos[0] // self.TILE_SIZE, pos[1] // self.TILE_SIZE
+		self.grid[row, col] = self.TILE_EMPTY
+		self.terrain[row, col] = 0
+		del self.tile_map[pos]
+		self.version += 1
+
 	def hitTile(self, pos, power=1):
 		"""
 			如果子弹停下, 返回 True。否则返回 False, 表示遇到河流、草块等非碰撞方块
 			@param: pos Tile's x, y in px, 子弹等级
 			@return: True if bullet was stopped, False otherwise
 		"""
-		for tile in self.mapr:
-			if tile.topleft == pos:
-				if tile.type == self.TILE_BRICK:
-					self.mapr.remove(tile)
-					self.updateObstacleRects()
-					return True
-				elif tile.type == self.TILE_STEEL:
-					if power == 2:  # 强子弹击穿铁块
-						self.mapr.remove(tile)
-						self.updateObstacleRects()
-					return True
-				else:
-					return False
+		tile = self.tile_map.get(tuple(pos))
+		if tile is None:
+			return None
+		if tile.type == self.TILE_BRICK:
+			self.removeTile(tile.topleft)
+			return True
+		elif tile.type == self.TILE_STEEL:
+			if power == 2:  # 强子弹击穿铁块
+				self.removeTile(tile.topleft)
+			return True
+		else:
+			return False
+
+	def obstacleTiles(self, rect):
+		""" Obstacle tiles overlapped by rect. Only the cells under rect are looked at """
+		ts, last = self.TILE_SIZE, self.MAP_TILES - 1
+		cols = range(max(rect.left, 0) // ts, min((rect.right - 1) // ts, last) + 1)
+		rows = range(max(rect.top, 0) // ts, min((rect.bottom - 1) // ts, last) + 1)
+		tiles = []
+		for row in rows:
+			for col in cols:
+				tile = self.tile_map.get((col * ts, row * ts))
+				if tile is not None and tile.type in self.OBSTACLE_TILES:
+					tiles.append(tile)
+		return tiles
+
+	def collideObstacle(self, rect):
+		""" True if rect overlaps an obstacle tile or the castle """
+		return rect.colliderect(self.game.castle.rect) or len(self.obstacleTiles(rect)) > 0
 
 	def toggleWaves(self):
 		""" Toggle water image 水波效果 """
@@ -70,43 +117,47 @@ class Level():
 		else:
 			self.tiles[self.TILE_WATER] = self.tile_water1
 			self.current_water = 0
+		self.version += 1
 
 
 	def loadLevel(self, level_nr = 1):
-		""" Load specified level 根据配置文件加载地图
+		""" Load specified level 从 LEVELS 缓存中复制地图
 		@return boolean Whether level was loaded
 		"""
-		filename = "levels/"+str(level_nr)
-		if (not os.path.isfile(filename)):
+		tiles = LEVELS.get(level_nr)
+		if tiles is None:
 			return False
-		level = []
-		f = open(filename, "r")
-		data = f.read().split("\n")
-		self.mapr = []
-		x, y = 0, 0
-		for row in data:
-			for ch in row:
-				if ch in self.char2tile.keys():
-					self.mapr.append(myRect(x, y, self.TILE_SIZE, self.TILE_SIZE, self.char2tile[ch]))
-				x += self.TILE_SIZE
-			x = 0
-			y += self.TILE_SIZE
+		self.grid[:] = tiles
+		self.terrain[:] = self.TERRAIN_VALUES[tiles]
+		self.tile_map = dict(LEVELS.items(level_nr))
+		self.version += 1
 		return True
 
-	def draw(self, tiles=None):
-		""" Draw specified map on top of existing surface """
+	def __getstate__(self):
+		""" Pickled without the tile rects, tile_map is kept as its order of flat cell indices """
+		state = self.__dict__.copy()
+		ts, n = self.TILE_SIZE, self.MAP_TILES
+		state["tile_map"] = np.array([y // ts * n + x // ts for x, y in self.tile_map], dtype=np.int16)
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		ts, n = self.TILE_SIZE, self.MAP_TILES
+		types = self.grid.ravel().tolist()
+		self.tile_map = {}
+		for i in state["tile_map"].tolist():
+			x, y = i % n * ts, i // n * ts
+			self.tile_map[(x, y)] = tileRect(x, y, types[i])
+
+	def draw(self, tiles=None, surface=None):
+		""" Draw tiles of the specified types (all if None) on surface, game.screen by default """
+		if tiles is None:
+			tiles = self.tiles.keys()
+		if surface is None:
+			surface = self.game.screen
 		for tile in self.mapr:
-			if tile.type in self.tiles.keys():
-				self.game.screen.blit(self.tiles[tile.type], tile.topleft)
-
-	def updateObstacleRects(self):
-		""" Set self.obstacle_rects to all tiles' rects that players can destroy
-		with bullets """
-		self.obstacle_rects = [self.game.castle.rect]
-
-		for tile in self.mapr:
-			if tile.type in (self.TILE_BRICK, self.TILE_STEEL, self.TILE_WATER):
-				self.obstacle_rects.append(tile)
+			if tile.type in tiles:
+				surface.blit(self.tiles[tile.type], tile.topleft)
 
 	def buildFortress(self, tile):
 		""" Build walls around castle made from tile """
@@ -121,11 +172,77 @@ class Level():
 			(13*self.TILE_SIZE, 23*self.TILE_SIZE)
 		]
 
-		for i, rect in enumerate(self.mapr):
-			if rect.topleft in positions:
-				self.mapr.remove(rect)  # remove obsolete blocks
-
 		for pos in positions:
-			self.mapr.append(myRect(pos[0], pos[1], self.TILE_SIZE, self.TILE_SIZE, tile))
-
-		self.updateObstacleRects()
\ No newline at end of file
+			self.setTile(pos, tile)  # replaces obsolete blocks
+
+
+class LevelStore():
+	""" Level maps parsed once into read-only (26, 26) uint8 tile arrays
+	Text files in dirname are parsed on first use, or everything is loaded from a .npz
+	bundle written by save(). Shared by all games in the process, see LEVELS
+	"""
+	def __init__(self, dirname="levels", bundle=None):
+		self.dirname = dirname
+		self.maps = {}   # level_nr -> tiles
+		self.nonempty = {}  # level_nr -> [((x, y), tile rect)] of non-empty cells, row-major
+		if bundle is not None:
+			with np.load(bundle) as f:
+				for key in f.files:
+					self._add(int(key), f[key])
+
+	def _add(self, level_nr, tiles):
+		tiles = np.array(tiles, dtype=np.uint8)
+		tiles.setflags(write=False)
+		self.maps[level_nr] = tiles
+		ts = Level.TILE_SIZE
+		self.nonempty[level_nr] = [
+			((int(c)*ts, int(r)*ts), tileRect(int(c)*ts, int(r)*ts, int(tiles[r, c]))) for r, c in zip(*np.nonzero(tiles))]
+
+	def parse(self, filename):
+		""" Tile array of one level file """
+		tiles = np.zeros((Level.MAP_TILES, Level.MAP_TILES), dtype=np.uint8)
+		with open(filename, "r") as f:
+			for row, line in enumerate(f.read().split("\n")):
+				for col, ch in enumerate(line):
+					if ch in Level.char2tile:
+						tiles[row, col] = Level.char2tile[ch]
+		return tiles
+
+	def get(self, level_nr):
+		""" Read-only tile array of a level, None if there is no such level """
+		if level_nr not in self.maps:
+			filename = os.path.join(self.dirname, str(level_nr))
+			if not os.path.isfile(filename):
+				return None
+			self._add(level_nr, self.parse(filename))
+		return self.maps[level_nr]
+
+	def items(self, level_nr):
+		""" ((x, y), tile rect) of the non-empty cells of a loaded level, row-major, for tile_map """
+		return self.nonempty[level_nr]
+
+	def loadAll(self):
+		""" Parse every level file in dirname """
+		for name in os.listdir(self.dirname):
+			if name.isdigit():
+				self.get(int(name))
+		return self.maps
+
+	def save(self, filename):
+		""" Write all levels as one .npz bundle, for LevelStore(bundle=filename) """
+		np.savez_compressed(filename, **{str(nr): tiles for nr, tiles in sorted(self.loadAll().items())})
+
+
+_tile_rects = {}  # (x, y, type) -> myRect
+
+def tileRect(x, y, tile_type):
+	""" Shared myRect of a tile. Tile rects are never modified, so every level uses the
+	same object for the same cell and type """
+	key = (x, y, tile_type)
+	rect = _tile_rects.get(key)
+	if rect is None:
+		rect = _tile_rects[key] = myRect(x, y, Level.TILE_SIZE, Level.TILE_SIZE, tile_type)
+	return rect
+
+
+LEVELS = LevelStore()
@@ -7,11 +7,14 @@ import torch.nn as nn
 import torch.nn.functional as F
 
 class CatEnv():  # 用来接管环境，一次返回两帧，中间忽略一些帧
-    def __init__(self, env, skips=3):
+    def __init__(self, env, skips=3, recorder=None):
+        """ recorder: optional VideoRecorder, step(render=True) streams frames into it
+        instead of saving JPEGs into outputs/ """
         self.env = env
         self.skips = skips
+        self.recorder = recorder
         folder_path = "outputs"
-        if not os.path.exists(folder_path):
+        if recorder is None and not os.path.exists(folder_path):
             os.makedirs(folder_path)
             print(f"'{folder_path}' folder created.")
 
@@ -25,11 +28,12 @@ class CatEnv():  # 用来接管环境，一次返回两帧，中间忽略一些
 
     def step(self, action=5, render=False):
         states = []
+        profiler = self.env.profiler
+        if profiler is not None:  # info["profile"] 覆盖所有子步和拼接观测
+            profiler.open_window()
         next_state, reward, done, truncated, info = self.env.step(action)
         if render:
-            self.count += 1
-            screen = self.env.render()
-            Image.fromarray(screen).save(f"outputs/{self.count:0>4}.jpg")
+            self.capture()
         rewards = reward
         states.append(next_state.flatten())
         for _ in range(self.skips):
@@ -37,15 +41,31 @@ class CatEnv():  # 用来接管环境，一次返回两帧，中间忽略一些
                 break
             next_state, reward, done, truncated, info = self.env.step(action)
             if render:
-                self.count += 1
-                screen = self.env.render()
-                Image.fromarray(screen).save(f"outputs/{self.count:0>4}.jpg")
+                self.capture()
             rewards += reward
         states.append(next_state.flatten())
-        states.append(self.env.feature())
-        states = np.concatenate(states)
+        if profiler is not None:  # 拼接观测的开销单独计时
+            states = profiler.call("catenv", self.stack, states)
+            profiler.close_window()
+            info = dict(info, profile=profiler.info())
+        else:
+            states = self.stack(states)
         return states, rewards, done, truncated, info
 
+    def stack(self, states):
+        """ Frames followed by the hand-made features, as one flat observation """
+        states.append(self.env.feature())
+        return np.concatenate(states)
+
+    def capture(self):
+        """ Save the current rgb frame """
+        self.count += 1
+        screen = self.env.render()
+        if self.recorder is not None:
+            self.recorder.write(screen)
+        else:
+            Image.fromarray(screen).save(f"outputs/{self.count:0>4}.jpg")
+
 
 class ResBlock(nn.Module):
     def __init__(self, in_dim, hid_dim, hid_layers=2):
@@ -0,0 +1,184 @@
+""" Rollout planner over the Game simulator
+For every decision the current game is snapshotted with Game.get_state, each of the 6
+actions is tried by short rollouts (the action held for `hold` steps, then random
+actions) and the action with the best mean discounted return is played.
+Rollouts run in a process pool, every worker keeps one headless Game and restores the
+snapshot with set_state, so only the snapshot bytes are sent to the workers. The planned
+game can be headless or rendered, rendered snapshots restore into headless games.
+Usage: python planner.py [--games 1] [--budget 100] [--workers N] [--teach teacher.npz]
+"""
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+from game import Game
+
+ACTION_SIZE = 6
+_game = None  # rollout game of this process
+
+
+def _worker_game():
+    global _game
+    if _game is None:
+        _game = Game(render_mode="grid", headless=True, seed=0)
+        _game.reset()
+    return _game
+
+
+def _rollouts(state, offset, budget, depth, hold, gamma, resample, seed):
+    """ Rollouts from one snapshot until budget seconds are used, at least one
+    The first action cycles through all actions starting at offset
+    @return (sum of returns, number of rollouts) per first action
+    """
+    deadline = time.perf_counter() + budget
+    game = _worker_game()
+    rng = random.Random(seed)
+    returns, counts = [0.0] * ACTION_SIZE, [0] * ACTION_SIZE
+    k = 0
+    while k == 0 or time.perf_counter() < deadline:
+        first = (offset + k) % ACTION_SIZE
+        game.set_state(state)
+        if resample:  # 不让规划利用快照里已经确定的随机数
+            game.rng.seed(rng.getrandbits(32))
+        total, discount = 0.0, 1.0
+        for t in range(depth):
+            action = first if t < hold else rng.randrange(ACTION_SIZE)
+            _, reward, done, truncated, _ = game.step(action)
+            total += discount * reward
+            discount *= gamma
+            if done or truncated:
+                break
+        returns[first] += total
+        counts[first] += 1
+        k += 1
+    return returns, counts
+
+
+class RolloutPlanner():
+    """ Flat Monte Carlo planner: every action gets about the same number of rollouts
+    within budget_ms per decision, spread over n_workers processes (0 runs them in this process,
+    None uses one per CPU)
+    depth: game steps per rollout, hold: steps the first action is repeated (CatEnv repeats 4)
+    resample: reseed the game RNG of every rollout. With False the rollouts replay the
+        snapshot's RNG and see future enemy spawns and paths, which the observations do not show
+    """
+    def __init__(self, n_workers=None, budget_ms=100, depth=40, hold=4, gamma=0.99, resample=True, seed=None):
+        self.n_workers = os.cpu_count() if n_workers is None else n_workers
+        self.budget = budget_ms / 1000
+        self.depth = depth
+        self.hold = hold
+        self.gamma = gamma
+        self.resample = resample
+        self.rng = random.Random(seed)
+        self.pool = None
+        if self.n_workers > 0:
+            self.pool = ProcessPoolExecutor(self.n_workers, initializer=_worker_game)
+        self.n_decisions, self.n_rollouts = 0, 0
+
+    def plan(self, game):
+        """ Search from the current state of game, which is not modified
+        @return (best action, mean return per action, rollouts per action)
+        """
+        state = game.get_state()
+        args = (self.budget, self.depth, self.hold, self.gamma, self.resample)
+        if self.pool is None:
+            results = [_rollouts(state, 0, *args, self.rng.getrandbits(32))]
+        else:
+            futures = [
+                self.pool.submit(_rollouts, state, i * ACTION_SIZE // self.n_workers, *args, self.rng.getrandbits(32))
+                for i in range(self.n_workers)
+            ]
+            results = [future.result() for future in futures]
+        returns = np.sum([r for r, _ in results], axis=0)
+        counts = np.sum([c for _, c in results], axis=0)
+        values = np.full(ACTION_SIZE, -np.inf)
+        tried = counts > 0
+        values[tried] = returns[tried] / counts[tried]
+        self.n_decisions += 1
+        self.n_rollouts += int(counts.sum())
+        return int(np.argmax(values)), values, counts
+
+    def act(self, game):
+        return self.plan(game)[0]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def play_game(planner, seed=None, max_t=1000, hold=4):
+    """ One game where the planner picks an action every `hold` steps, returns the score """
+    game = Game(render_mode="grid", headless=True, seed=seed)
+    game.reset()
+    score = 0
+    for t in range(max_t):
+        action = planner.act(game)
+        for _ in range(hold):
+            _, reward, done, truncated, _ = game.step(action)
+            score += reward
+            if done or truncated:
+                break
+        if done:
+            break
+        if truncated:
+            game.reset()
+    return score
+
+
+def teach(planner, filename, n_steps=1000, seed=None):
+    """ Let the planner play through CatEnv and save (CatEnv state, action) pairs as .npz,
+    targets for distilling the planner into QNetwork """
+    from model import CatEnv
+    game = Game(render_mode="grid", headless=True, seed=seed)
+    env = CatEnv(game)
+    state, info = env.reset()
+    states, actions = [], []
+    for t in range(n_steps):
+        action = planner.act(game)
+        states.append(state)
+        actions.append(action)
+        state, reward, done, truncated, info = env.step(action)
+        if done or truncated:
+            state, info = env.reset()
+    np.savez_compressed(filename, states=np.array(states, dtype=np.float32), actions=np.array(actions, dtype=np.uint8))
+    print(f"{len(states)} planner decisions saved to {filename}")
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=1, help="games to play")
+    parser.add_argument("--budget", type=float, default=100, help="planning time per decision in ms")
+    parser.add_argument("--workers", type=int, default=None, help="rollout processes (default: one per CPU), 0 plans in this process")
+    parser.add_argument("--depth", type=int, default=40, help="game steps per rollout")
+    parser.add_argument("--seed", type=int, default=42, help="the random seed")
+    parser.add_argument("--no_resample", action="store_true", help="let rollouts reuse the game's RNG, i.e. see the future")
+    parser.add_argument("--teach", type=str, default=None, help="save planner decisions to this .npz instead")
+    parser.add_argument("--steps", type=int, default=1000, help="decisions to save with --teach")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(f"args: {args}")
+    with RolloutPlanner(args.workers, args.budget, args.depth, resample=not args.no_resample, seed=args.seed) as planner:
+        if args.teach:
+            teach(planner, args.teach, args.steps, seed=args.seed)
+        else:
+            for i in range(args.games):
+                t0 = time.perf_counter()
+                score = play_game(planner, seed=args.seed + i)
+                print(f"game {i}: score {score:.1f}, {time.perf_counter() - t0:.1f} s")
+        print(f"{planner.n_rollouts / max(planner.n_decisions, 1):.1f} rollouts per decision")
@@ -20,11 +20,8 @@ class Player(Tank):
 		
 		if filename == None:
 			filename = (0, 0, 16*2, 16*2)
-		self.image = self.game.sprites.subsurface(filename)
-		self.image_up = self.image
-		self.image_left = pygame.transform.rotate(self.image, 90)
-		self.image_down = pygame.transform.rotate(self.image, 180)
-		self.image_right = pygame.transform.rotate(self.image, 270)
+		if not self.game.headless:
+			self.images = self.game.atlas.rotated(filename)
 
 		if direction == None:
 			self.rotate(self.DIR_UP, False)
@@ -68,7 +65,7 @@ class Player(Tank):
 		player_rect = pygame.Rect(new_position, [26, 26])
 
 		# collisions with tiles
-		if player_rect.collidelist(self.level.obstacle_rects) != -1:
+		if self.level.collideObstacle(player_rect):
 			return  # ignore update
 
 		# collisions with other players
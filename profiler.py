@@ -0,0 +1,84 @@
+import time
+
+perf_counter = time.perf_counter
+
+
+class StepProfiler():
+	""" Wall time and call counts per phase of Game.step, plus entity counts
+	Game.step calls lap() between phases, so a disabled profiler (game.profiler is None)
+	costs one `is None` check per phase. Times of the latest step are in self.last,
+	and are also returned as info["profile"]. Between open_window() and close_window()
+	self.last sums up all steps instead, for wrappers like CatEnv that make several
+	Game.step calls per step.
+	"""
+	def __init__(self):
+		self.reset()
+
+	def reset(self):
+		self.times = {}     # phase -> total seconds
+		self.calls = {}     # phase -> number of calls
+		self.entities = {}  # name -> [sum over steps, max]
+		self.steps = 0
+		self.last = {}      # phase -> seconds in the latest step (or window)
+		self.last_counts = {}
+		self.window = False
+
+	def begin(self):
+		""" Start of a step, returns the first lap time """
+		self.steps += 1
+		if not self.window:
+			self.last = {}
+		return perf_counter()
+
+	def open_window(self):
+		""" Let self.last and info() cover every step until close_window() """
+		self.last = {}
+		self.window = True
+
+	def close_window(self):
+		self.window = False
+
+	def lap(self, phase, t0):
+		""" Charge the time since t0 to phase, returns now for the next lap """
+		now = perf_counter()
+		self.add(phase, now - t0)
+		return now
+
+	def add(self, phase, seconds):
+		self.times[phase] = self.times.get(phase, 0.0) + seconds
+		self.calls[phase] = self.calls.get(phase, 0) + 1
+		self.last[phase] = self.last.get(phase, 0.0) + seconds
+
+	def call(self, phase, fn, *args):
+		""" fn(*args), timed as phase. For nested phases such as Enemy.generatePath """
+		t0 = perf_counter()
+		result = fn(*args)
+		self.add(phase, perf_counter() - t0)
+		return result
+
+	def count(self, **counts):
+		""" Record entity counts of the current step, e.g. count(enemies=4, bullets=2) """
+		self.last_counts = counts
+		for name, n in counts.items():
+			entry = self.entities.get(name)
+			if entry is None:
+				self.entities[name] = [n, n]
+			else:
+				entry[0] += n
+				entry[1] = max(entry[1], n)
+
+	def info(self):
+		""" Timings and entity counts of the latest step, for the info dict """
+		return {"times": dict(self.last), "entities": dict(self.last_counts)}
+
+	def summary(self):
+		""" Table of total/mean time per phase, sorted by total time """
+		total = sum(t for phase, t in self.times.items() if "." not in phase)  # 带 . 的是嵌套阶段, 不重复计入
+		lines = [f"{self.steps} steps, {total*1000:.1f} ms, {total/max(self.steps, 1)*1e6:.1f} us/step"]
+		lines.append(f"{'phase':<24}{'calls':>9}{'total ms':>11}{'mean us':>10}{'share':>8}")
+		for phase, t in sorted(self.times.items(), key=lambda item: -item[1]):
+			calls = self.calls[phase]
+			lines.append(f"{phase:<24}{calls:>9}{t*1000:>11.1f}{t/calls*1e6:>10.1f}{t/max(total, 1e-12):>8.1%}")
+		for name, (n, n_max) in self.entities.items():
+			lines.append(f"{name:<24} mean {n/max(self.steps, 1):.2f}, max {n_max}")
+		return "\n".join(lines)
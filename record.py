@@ -0,0 +1,103 @@
+import zlib
+import numpy as np
+from game import Game
+
+# 紧凑录像: 只存种子, 关卡, 每步动作和 time_passed, 画面由 replay 重新模拟得到
+RECORD_VERSION = 1
+
+
+def state_checksum(game):
+	""" crc32 over the simulation state (world_arrays), independent of render mode """
+	crc = 0
+	for name, array in sorted(game.world_arrays().items()):
+		crc = zlib.crc32(array.tobytes(), crc)
+	return crc
+
+
+class GameRecorder():
+	""" Logs the inputs of a Game so replay() can re-simulate it
+	Call start() right after every game.reset() and add() after every game.step().
+	Every check_interval steps a state checksum is stored to detect divergence.
+	"""
+	def __init__(self, game, check_interval=100):
+		self.game = game
+		self.check_interval = check_interval
+		self.seeds, self.stages, self.episode_starts = [], [], []
+		self.actions, self.time_passed = [], []
+		self.check_steps, self.checksums = [], []
+
+	def start(self):
+		""" Mark the beginning of an episode """
+		self.seeds.append(self.game.seed)
+		self.stages.append(self.game.stage)
+		self.episode_starts.append(len(self.actions))
+
+	def add(self, action, time_passed=33):
+		self.actions.append(action)
+		self.time_passed.append(time_passed)
+		step = len(self.actions)
+		if step % self.check_interval == 0:
+			self.check_steps.append(step)
+			self.checksums.append(state_checksum(self.game))
+
+	def __len__(self):
+		return len(self.actions)
+
+	def save(self, filename):
+		""" Write the record as a compressed .npz """
+		assert len(self.seeds) > 0, "start() was never called"
+		np.savez_compressed(
+			filename,
+			version=RECORD_VERSION,
+			seeds=np.array(self.seeds, dtype=np.uint32),
+			stages=np.array(self.stages, dtype=np.uint8),
+			episode_starts=np.array(self.episode_starts, dtype=np.int64),
+			actions=np.array(self.actions, dtype=np.uint8),
+			time_passed=np.array(self.time_passed, dtype=np.uint32),  # 人类模式下卡顿的一帧可能超过 65535 ms
+			check_steps=np.array(self.check_steps, dtype=np.int64),
+			checksums=np.array(self.checksums, dtype=np.uint32),
+		)
+		print(f"{len(self.actions)} steps recorded to {filename}")
+
+
+def load_record(filename):
+	""" Record saved by GameRecorder.save as a dict of arrays """
+	with np.load(filename) as f:
+		record = {key: f[key] for key in f.files}
+	assert int(record["version"]) == RECORD_VERSION, f"unsupported record version {record['version']}"
+	return record
+
+
+def replay(record, render_mode="grid", check=True):
+	""" Re-simulate a record. Yields the observation after every reset and after every step,
+	so each episode gives one more observation than it has actions
+	render_mode: any Game render mode, the game runs headless unless it is "rgb"
+	check: compare the stored checksums and raise RuntimeError at the first mismatch
+	"""
+	if isinstance(record, str):
+		record = load_record(record)
+	game = Game(render_mode=render_mode, headless=render_mode != "rgb")
+	starts = {int(s): i for i, s in enumerate(record["episode_starts"])}
+	checks = dict(zip(record["check_steps"].tolist(), record["checksums"].tolist()))
+
+	for i, (action, time_passed) in enumerate(zip(record["actions"], record["time_passed"])):
+		if i in starts:
+			episode = starts[i]
+			obs, _ = game.reset(int(record["stages"][episode]), seed=int(record["seeds"][episode]))
+			yield obs
+		obs, reward, done, truncated, info = game.step(int(action), time_passed=int(time_passed))
+		step = i + 1
+		if check and step in checks and state_checksum(game) != checks[step]:
+			raise RuntimeError(f"replay diverged at step {step}")
+		yield obs
+
+
+def record_states(record, render_mode="grid"):
+	""" (states, actions) of a record in the layout Game.save_record writes:
+	the observation after every step, as uint8, next to the action of that step
+	"""
+	if isinstance(record, str):
+		record = load_record(record)
+	resets = {int(start) + k for k, start in enumerate(record["episode_starts"])}  # reset 观测在 replay 输出中的位置
+	states = [obs for i, obs in enumerate(replay(record, render_mode)) if i not in resets]
+	return np.array(states, dtype=np.uint8), np.array(record["actions"], dtype=np.int64)
@@ -0,0 +1,66 @@
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+
+class VideoRecorder():
+    """ Streams rgb frames into a video file from a background thread
+    write() copies the frame (Game.render returns a view that the next frame overwrites)
+    and puts it on a bounded queue, so a slow encoder blocks the game instead of
+    piling up frames in memory. Nothing else is written to disk.
+    """
+    def __init__(self, path, fps=30, fourcc="mp4v", max_queue=64):
+        self.path = path
+        self.fps = fps
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.frames = queue.Queue(maxsize=max_queue)
+        self.writer = None
+        self.n_frames = 0
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._encode, daemon=True)
+        self.thread.start()
+
+    def write(self, frame):
+        """ Queue one (h, w, 3) rgb frame """
+        if self.error is not None:
+            raise self.error
+        assert not self.closed, "recorder is closed"
+        self.frames.put(np.ascontiguousarray(frame[..., ::-1]))  # 拷贝的同时转成 cv2 的 BGR
+        self.n_frames += 1
+
+    def close(self):
+        """ Encode the queued frames and finish the file """
+        if self.closed:
+            return
+        self.closed = True
+        self.frames.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _encode(self):
+        try:
+            while True:
+                frame = self.frames.get()
+                if frame is None:
+                    break
+                if self.writer is None:  # 第一帧决定视频尺寸
+                    h, w = frame.shape[:2]
+                    self.writer = cv2.VideoWriter(self.path, self.fourcc, self.fps, (w, h))
+                self.writer.write(frame)
+        except Exception as e:
+            self.error = e
+            while self.frames.get() is not None:  # 丢掉剩余帧, 不让 write() 卡住
+                pass
+        finally:
+            if self.writer is not None:
+                self.writer.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,233 @@
+import numpy as np
+
+
+class ReplayBuffer():
+    """ Ring buffer over preallocated arrays
+    A CatEnv state is two 26x26 grid frames (values 0~255) followed by 25 features,
+    the first frame_size values are kept as uint8 and the rest as float32.
+    States without grid frames (e.g. feature observations) need frame_size=0.
+    """
+    def __init__(self, buffer_size, batch_size, state_size=1377, frame_size=1352):
+        self.buffer_size = int(buffer_size)
+        self.batch_size = batch_size
+        self.state_size = state_size
+        assert 0 <= frame_size <= state_size, \
+            f"frame_size {frame_size} > state_size {state_size}, use frame_size=0 for states without grid frames"
+        self.frame_size = frame_size
+
+        n, feature_size = self.buffer_size, state_size - self.frame_size
+        self.frames = np.zeros((n, self.frame_size), dtype=np.uint8)
+        self.features = np.zeros((n, feature_size), dtype=np.float32)
+        self.next_frames = np.zeros((n, self.frame_size), dtype=np.uint8)
+        self.next_features = np.zeros((n, feature_size), dtype=np.float32)
+        self.actions = np.zeros(n, dtype=np.int64)
+        self.rewards = np.zeros(n, dtype=np.float32)
+        self.masks = np.zeros(n, dtype=np.float32)  # 1-done
+        self.pos = 0   # next slot to write
+        self.size = 0
+
+    def add(self, state, action, reward, next_state, done, stream=0):
+        """ stream is only used by FrameReplayBuffer """
+        i, fs = self.pos, self.frame_size
+        self.frames[i] = state[:fs]
+        self.features[i] = state[fs:]
+        self.next_frames[i] = next_state[:fs]
+        self.next_features[i] = next_state[fs:]
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.masks[i] = 1 - done
+        self.pos = (i + 1) % self.buffer_size
+        self.size = min(self.size + 1, self.buffer_size)
+
+    def sample(self):
+        """ Uniformly sample batch_size transitions
+        @return (states, actions, rewards, next_states, masks) as contiguous arrays,
+        ready for torch.from_numpy
+        """
+        return self.gather(self.sample_indices())
+
+    def sample_indices(self):
+        return np.random.randint(0, self.size, size=self.batch_size)
+
+    def gather(self, indices):
+        """ Transitions at the given slots """
+        states = self._stack(self.frames, self.features, indices)
+        next_states = self._stack(self.next_frames, self.next_features, indices)
+        return states, self.actions[indices], self.rewards[indices], next_states, self.masks[indices]
+
+    def _stack(self, frames, features, indices):
+        out = np.empty((len(indices), self.state_size), dtype=np.float32)
+        out[:, :self.frame_size] = frames[indices]
+        out[:, self.frame_size:] = features[indices]
+        return out
+
+    def __len__(self):
+        return self.size
+
+
+class FrameReplayBuffer(ReplayBuffer):
+    """ Keeps every observation once in a circular store
+    Slot i holds one observation and, if valid[i], the transition from it to slot next_slot[i].
+    Each stream (an env or actor) remembers the slot of its last next_state: when its next
+    state continues from there, only the new next_state takes a slot, so interleaved
+    streams share the store without storing observations twice. A state that does not
+    continue its stream (a new episode) gets a slot of its own.
+    """
+    def __init__(self, buffer_size, batch_size, state_size=1377, frame_size=1352):
+        self.buffer_size = int(buffer_size)
+        self.batch_size = batch_size
+        self.state_size = state_size
+        assert 0 <= frame_size <= state_size, \
+            f"frame_size {frame_size} > state_size {state_size}, use frame_size=0 for states without grid frames"
+        self.frame_size = frame_size
+
+        n = self.buffer_size
+        self.frames = np.zeros((n, self.frame_size), dtype=np.uint8)
+        self.features = np.zeros((n, state_size - self.frame_size), dtype=np.float32)
+        self.actions = np.zeros(n, dtype=np.int64)
+        self.rewards = np.zeros(n, dtype=np.float32)
+        self.masks = np.zeros(n, dtype=np.float32)
+        self.valid = np.zeros(n, dtype=bool)  # slot i holds a transition i -> next_slot[i]
+        self.next_slot = np.zeros(n, dtype=np.int64)
+        self.prev_slot = np.full(n, -1, dtype=np.int64)  # transition that ends in slot i
+        self.stamps = np.zeros(n, dtype=np.int64)        # write count when the slot was written
+        self.n_written = 0
+        self.cursor = 0      # next slot to overwrite
+        self.filled = 0      # slots written so far, up to buffer_size
+        self.size = 0        # valid transitions
+        self.streams = {}    # stream -> (slot, stamp, copy of its last next_state)
+
+    def _invalidate(self, slot):
+        if slot >= 0 and self.valid[slot]:
+            self.valid[slot] = False
+            self.size -= 1
+
+    def _write(self, obs):
+        """ Store obs in the next slot, transitions starting or ending there are dropped """
+        slot = self.cursor
+        self._invalidate(slot)
+        self._invalidate(self.prev_slot[slot])
+        self.prev_slot[slot] = -1
+        self.frames[slot] = obs[:self.frame_size]
+        self.features[slot] = obs[self.frame_size:]
+        self.n_written += 1
+        self.stamps[slot] = self.n_written
+        self.cursor = (slot + 1) % self.buffer_size
+        self.filled = max(self.filled, slot + 1)
+        return slot
+
+    def add(self, state, action, reward, next_state, done, stream=0):
+        """ stream: id of the env/actor the transition comes from, when several are interleaved """
+        last = self.streams.get(stream)
+        if (last is not None and self.stamps[last[0]] == last[1] and self.cursor != last[0]
+                and np.array_equal(state, last[2])):
+            i = last[0]  # 接着这个 stream 上一步的 next_state
+        else:
+            i = self._write(state)
+        j = self._write(next_state)
+        self._invalidate(i)  # 同一个 state 重复加入时, 以最新的转移为准
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.masks[i] = 1 - done
+        self.next_slot[i] = j
+        self.prev_slot[j] = i
+        self.valid[i] = True
+        self.size += 1
+        self.streams[stream] = (j, self.stamps[j], np.array(next_state))  # own copy, callers may reuse their arrays
+
+    def sample_indices(self):
+        indices = np.random.randint(0, self.filled, size=self.batch_size)
+        invalid = ~self.valid[indices]
+        while invalid.any():  # 重新抽取不完整的位置, 它们只占很小的比例
+            indices[invalid] = np.random.randint(0, self.filled, size=invalid.sum())
+            invalid = ~self.valid[indices]
+        return indices
+
+    def gather(self, indices):
+        next_indices = self.next_slot[indices]
+        states = self._stack(self.frames, self.features, indices)
+        next_states = self._stack(self.frames, self.features, next_indices)
+        return states, self.actions[indices], self.rewards[indices], next_states, self.masks[indices]
+
+
+class SumTree():
+    """ Binary sum tree over `capacity` leaf priorities, stored in one array
+    tree[1] is the total, node i has children 2i and 2i+1, leaves start at self.leaf_start.
+    Updates and lookups walk one level at a time for the whole batch.
+    """
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self.leaf_start = 1
+        while self.leaf_start < self.capacity:
+            self.leaf_start *= 2
+        self.tree = np.zeros(2 * self.leaf_start, dtype=np.float64)
+
+    def total(self):
+        return self.tree[1]
+
+    def get(self, indices):
+        return self.tree[self.leaf_start + indices]
+
+    def update(self, indices, priorities):
+        """ Set leaf priorities, then refresh their ancestors, O(log n) per index """
+        nodes = self.leaf_start + np.asarray(indices)
+        self.tree[nodes] = priorities
+        nodes = nodes // 2
+        while nodes[0] > 0:  # 所有叶子在同一层, 一起往上走; 重复的父节点写入的是同一个值
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes = nodes // 2
+
+    def find(self, values):
+        """ Leaf index for each value in [0, total), i.e. where the prefix sum passes the value """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.leaf_start:
+            left = self.tree[2 * nodes]
+            go_right = values >= left
+            values -= np.where(go_right, left, 0)
+            nodes = 2 * nodes + go_right
+        return nodes - self.leaf_start
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """ Proportional prioritized replay (Schaul et al. 2016) on top of ReplayBuffer
+    P(i) = p_i^alpha / sum p^alpha with p_i = |td error| + eps. New transitions get the
+    largest priority seen so far. beta (importance-sampling) grows to 1 over beta_steps samples.
+    """
+    def __init__(self, buffer_size, batch_size, state_size=1377, frame_size=1352,
+                 alpha=0.6, beta_start=0.4, beta_steps=1e5, eps=1e-3):
+        super().__init__(buffer_size, batch_size, state_size, frame_size)
+        self.tree = SumTree(self.buffer_size)
+        self.alpha, self.eps = alpha, eps
+        self.beta_start, self.beta_steps = beta_start, beta_steps
+        self.n_sampled = 0
+        self.max_priority = 1.0
+
+    def add(self, state, action, reward, next_state, done, stream=0):
+        slot = self.pos
+        super().add(state, action, reward, next_state, done)
+        self.tree.update([slot], self.max_priority ** self.alpha)
+
+    def sample(self):
+        """ Sample proportionally to priority
+        @return (states, actions, rewards, next_states, masks, weights, indices),
+        weights are the normalized importance-sampling weights, indices go back to update_priorities
+        """
+        # 分层采样: 把总和切成 batch_size 段, 每段取一个
+        total = self.tree.total()
+        segment = total / self.batch_size
+        values = (np.arange(self.batch_size) + np.random.random(self.batch_size)) * segment
+        indices = self.tree.find(np.minimum(values, np.nextafter(total, 0)))
+        indices = np.minimum(indices, self.size - 1)  # 浮点误差保护
+
+        beta = min(1.0, self.beta_start + (1.0 - self.beta_start) * self.n_sampled / self.beta_steps)
+        self.n_sampled += 1
+        probs = self.tree.get(indices) / total
+        weights = (self.size * probs) ** -beta
+        weights = (weights / weights.max()).astype(np.float32)
+        return self.gather(indices) + (weights, indices)
+
+    def update_priorities(self, indices, td_errors):
+        priorities = np.abs(td_errors) + self.eps
+        self.max_priority = max(self.max_priority, priorities.max())
+        self.tree.update(indices, priorities ** self.alpha)
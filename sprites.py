@@ -0,0 +1,117 @@
+import pygame
+
+SHEET_PATH = "images/sprites.png"
+SHEET_SIZE = [192, 224]  # sprites.png 放大两倍后的尺寸
+
+# 以下坐标都是放大后 sheet 上的 (x, y, w, h)
+PLAYER_RECT = (0, 0, 16*2, 16*2)
+ENEMY_RECTS = [  # 4 种敌人, 后 4 个是携带奖励时的闪烁贴图
+	(32*2, 0, 13*2, 15*2),
+	(48*2, 0, 13*2, 15*2),
+	(64*2, 0, 13*2, 15*2),
+	(80*2, 0, 13*2, 15*2),
+	(32*2, 16*2, 13*2, 15*2),
+	(48*2, 16*2, 13*2, 15*2),
+	(64*2, 16*2, 13*2, 15*2),
+	(80*2, 16*2, 13*2, 15*2)
+]
+BULLET_RECT = (75*2, 74*2, 3*2, 4*2)
+EXPLOSION_RECTS = [(0, 80*2, 32*2, 32*2), (32*2, 80*2, 32*2, 32*2), (64*2, 80*2, 32*2, 32*2)]
+SHIELD_RECTS = [(0, 48*2, 16*2, 16*2), (16*2, 48*2, 16*2, 16*2)]
+SPAWN_RECTS = [(32*2, 48*2, 16*2, 16*2), (48*2, 48*2, 16*2, 16*2)]
+TILE_RECTS = {
+	"brick": (48*2, 64*2, 8*2, 8*2),
+	"steel": (48*2, 72*2, 8*2, 8*2),
+	"grass": (56*2, 72*2, 8*2, 8*2),
+	"water1": (64*2, 64*2, 8*2, 8*2),
+	"water2": (72*2, 64*2, 8*2, 8*2),
+	"froze": (64*2, 72*2, 8*2, 8*2)
+}
+
+
+class SpriteAtlas():
+	""" Every image of the game cut out of the sprite sheet once
+	Tank and bullet images are pre-rotated and indexed by direction (up, right, down, left),
+	entities keep references into the atlas instead of creating their own surfaces.
+	"""
+	def __init__(self, path=SHEET_PATH):
+		self.sheet = pygame.transform.scale(pygame.image.load(path), SHEET_SIZE)
+		self.rotations = {}  # rect -> 4 rotated images
+		self.fonts = {}
+		self.refs = {}  # id(surface or font) -> key for lookup(), lets game snapshots refer to atlas images
+
+		self.player = self.rotated(PLAYER_RECT)
+		self.enemies = [  # enemies[type][flash]
+			(self.rotated(ENEMY_RECTS[t]), self.rotated(ENEMY_RECTS[t+4])) for t in range(4)
+		]
+		self.bullet = self.rotated(BULLET_RECT)
+		self.explosion = [self.sheet.subsurface(r) for r in EXPLOSION_RECTS]
+		self.shield = [self.sheet.subsurface(r) for r in SHIELD_RECTS]
+		self.spawn = [self.sheet.subsurface(r) for r in SPAWN_RECTS]
+
+		self.bonuses = [self.sheet.subsurface(16*2*b, 32*2, 16*2, 15*2) for b in range(6)]  # Bonus.BONUS_*
+
+		self.castle_undamaged = self.sheet.subsurface(0, 15*2, 16*2, 16*2)
+		self.castle_destroyed = self.sheet.subsurface(16*2, 15*2, 16*2, 16*2)
+		self.tiles = {name: self.sheet.subsurface(r) for name, r in TILE_RECTS.items()}
+		self.tiles["empty"] = pygame.Surface((8*2, 8*2))
+
+		self.enemy_life = self.sheet.subsurface(81*2, 57*2, 7*2, 7*2)
+		self.player_life = self.sheet.subsurface(89*2, 56*2, 7*2, 8*2)
+		self.flag = self.sheet.subsurface(64*2, 49*2, 16*2, 15*2)
+		self.icon = self.sheet.subsurface(0, 0, 13*2, 13*2)  # Yellow Tank
+
+		for name in ("explosion", "shield", "spawn", "bonuses", "tiles"):
+			images = getattr(self, name)
+			for i in (images.keys() if isinstance(images, dict) else range(len(images))):
+				self.refs[id(images[i])] = (name, i)
+		for name in ("castle_undamaged", "castle_destroyed", "enemy_life", "player_life", "flag", "icon"):
+			self.refs[id(getattr(self, name))] = (name,)
+
+	def rotated(self, rect):
+		""" Image at rect facing up, right, down and left, cached by rect """
+		rect = tuple(rect)
+		images = self.rotations.get(rect)
+		if images is None:
+			image = self.sheet.subsurface(rect)
+			images = (image, pygame.transform.rotate(image, 270),
+				pygame.transform.rotate(image, 180), pygame.transform.rotate(image, 90))
+			self.rotations[rect] = images
+			for direction, image in enumerate(images):
+				self.refs[id(image)] = ("rotated", rect, direction)
+		return images
+
+	def font(self, name, size):
+		""" Shared font, name is a .ttf path or a system font name """
+		key = (name, size)
+		if key not in self.fonts:
+			if name.endswith(".ttf"):
+				self.fonts[key] = pygame.font.Font(name, size)
+			else:
+				self.fonts[key] = pygame.font.SysFont(name, size)
+			self.refs[id(self.fonts[key])] = ("font", name, size)
+		return self.fonts[key]
+
+	def ref(self, obj):
+		""" Key of an atlas surface or font, None if obj does not come from the atlas """
+		return self.refs.get(id(obj))
+
+	def lookup(self, key):
+		""" Inverse of ref() """
+		kind = key[0]
+		if kind == "rotated":
+			return self.rotated(key[1])[key[2]]
+		if kind == "font":
+			return self.font(key[1], key[2])
+		obj = getattr(self, kind)
+		return obj[key[1]] if len(key) > 1 else obj
+
+
+_atlas = None
+
+def get_atlas():
+	""" The process-wide atlas, built on first use (needs pygame.init() for fonts) """
+	global _atlas
+	if _atlas is None:
+		_atlas = SpriteAtlas()
+	return _atlas
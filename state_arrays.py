@@ -0,0 +1,45 @@
+import numpy as np
+
+# 结构化数组: 每行一个实体, 只保存仿真状态, 不含 pygame 对象
+RECT_FIELDS = [("x", np.int32), ("y", np.int32), ("w", np.int32), ("h", np.int32)]
+ENTITY_DTYPE = np.dtype(RECT_FIELDS + [("direction", np.int8), ("side", np.int8), ("state", np.int8)])
+BONUS_DTYPE = np.dtype(RECT_FIELDS + [("bonus", np.int8)])
+TILE_DTYPE = np.dtype(RECT_FIELDS + [("type", np.int8)])
+
+
+def tank_array(tanks):
+	""" Tanks (players or enemies) as an ENTITY_DTYPE array """
+	return np.array([
+		(t.rect.left, t.rect.top, t.rect.width, t.rect.height, t.direction, t.side, t.state)
+		for t in tanks], dtype=ENTITY_DTYPE)
+
+
+def bullet_array(bullets):
+	""" Bullets as an ENTITY_DTYPE array, side is the owner's side """
+	return np.array([
+		(b.rect.left, b.rect.top, b.rect.width, b.rect.height, b.direction, b.owner_side, b.state)
+		for b in bullets], dtype=ENTITY_DTYPE)
+
+
+def bonus_array(bonuses):
+	return np.array([
+		(b.rect.left, b.rect.top, b.rect.width, b.rect.height, b.bonus)
+		for b in bonuses], dtype=BONUS_DTYPE)
+
+
+def tile_array(tiles):
+	""" myRect tiles as a TILE_DTYPE array """
+	return np.array([
+		(t.left, t.top, t.width, t.height, t.type)
+		for t in tiles], dtype=TILE_DTYPE)
+
+
+def world_arrays(game):
+	""" Snapshot of all simulation entities of a game, keyed by entity list name """
+	return {
+		"players": tank_array(game.players),
+		"enemies": tank_array(game.enemies),
+		"bullets": bullet_array(game.bullets),
+		"bonuses": bonus_array(game.bonuses),
+		"tiles": tile_array(game.level.mapr),
+	}
@@ -1,5 +1,4 @@
 import pygame
-import random
 from explosion import Explosion
 from bullet import Bullet
 from label import Label
@@ -34,18 +33,15 @@ class Tank:
 		self.controls = [pygame.K_j, pygame.K_w, pygame.K_d, pygame.K_s, pygame.K_a]
 		self.pressed = [False] * 4  # currently pressed buttons (navigation only)
 
-		self.shield_images = [
-			self.game.sprites.subsurface(0, 48*2, 16*2, 16*2),
-			self.game.sprites.subsurface(16*2, 48*2, 16*2, 16*2)
-		]
-		self.shield_image = self.shield_images[0]
 		self.shield_index = 0
-		self.spawn_images = [
-			self.game.sprites.subsurface(32*2, 48*2, 16*2, 16*2),
-			self.game.sprites.subsurface(48*2, 48*2, 16*2, 16*2)
-		]
-		self.spawn_image = self.spawn_images[0]
 		self.spawn_index = 0
+		self.image = None
+		self.images = None  # 4 个方向的贴图, 来自 game.atlas
+		if not self.game.headless:
+			self.shield_images = self.game.atlas.shield
+			self.shield_image = self.shield_images[0]
+			self.spawn_images = self.game.atlas.spawn
+			self.spawn_image = self.spawn_images[0]
 
 		if position != None:
 			self.rect = pygame.Rect(position, (26, 26))
@@ -53,25 +49,26 @@ class Tank:
 			self.rect = pygame.Rect(0, 0, 26, 26)
 
 		if direction == None:
-			self.direction = random.choice([self.DIR_RIGHT, self.DIR_DOWN, self.DIR_LEFT])
+			self.direction = self.game.rng.choice([self.DIR_RIGHT, self.DIR_DOWN, self.DIR_LEFT])
 		else:
 			self.direction = direction
 
 		self.state = self.STATE_SPAWNING
-		self.timer_uuid_spawn = self.game.timer_pool.add(100, self.toggleSpawnImage)  # spawning animation
-		self.timer_uuid_spawn_end = self.game.timer_pool.add(1000, self.endSpawning)  # duration of spawning
+		if not self.game.headless:
+			self.timer_id_spawn = self.game.timer_pool.add(100, self.toggleSpawnImage)  # spawning animation
+		self.timer_id_spawn_end = self.game.timer_pool.add(1000, self.endSpawning)  # duration of spawning
 
 	def endSpawning(self):
 		""" End spawning
 		Player becomes operational
 		"""
 		self.state = self.STATE_ALIVE
-		self.game.timer_pool.destroy(self.timer_uuid_spawn_end)
+		self.game.timer_pool.destroy(self.timer_id_spawn_end)
 
 	def toggleSpawnImage(self):
 		""" advance to the next spawn image """
-		if self.state != self.STATE_SPAWNING:
-			self.game.timer_pool.destroy(self.timer_uuid_spawn)
+		if self.game.headless or self.state != self.STATE_SPAWNING:  # headless, see Enemy.toggleFlash
+			self.game.timer_pool.destroy(self.timer_id_spawn)
 			return
 		self.spawn_index += 1
 		if self.spawn_index >= len(self.spawn_images):
@@ -80,8 +77,8 @@ class Tank:
 
 	def toggleShieldImage(self):
 		""" advance to the next shield image """
-		if self.state != self.STATE_ALIVE:
-			self.game.timer_pool.destroy(self.timer_uuid_shield)
+		if self.game.headless or self.state != self.STATE_ALIVE:
+			self.game.timer_pool.destroy(self.timer_id_shield)
 			return
 		if self.shielded:
 			self.shield_index += 1
@@ -92,13 +89,13 @@ class Tank:
 	def draw(self):
 		""" draw tank """
 		if self.state == self.STATE_ALIVE:
-			self.game.screen.blit(self.image, self.rect.topleft)
+			self.game.blit(self.image, self.rect.topleft)
 			if self.shielded:
-				self.game.screen.blit(self.shield_image, [self.rect.left-3, self.rect.top-3])
+				self.game.blit(self.shield_image, [self.rect.left-3, self.rect.top-3])
 		elif self.state == self.STATE_EXPLODING:
 			self.explosion.draw()
 		elif self.state == self.STATE_SPAWNING:
-			self.game.screen.blit(self.spawn_image, self.rect.topleft)
+			self.game.blit(self.spawn_image, self.rect.topleft)
 
 	def explode(self):
 		""" start tanks's explosion """
@@ -115,7 +112,7 @@ class Tank:
 		@return boolean True if bullet was fired, false otherwise
 		"""
 		if self.state != self.STATE_ALIVE:
-			self.game.timer_pool.destroy(self.timer_uuid_fire)
+			self.game.timer_pool.destroy(self.timer_id_fire)
 			return False
 
 		if self.paused:
@@ -149,14 +146,8 @@ class Tank:
 		"""
 		self.direction = direction
 
-		if direction == self.DIR_UP:
-			self.image = self.image_up
-		elif direction == self.DIR_RIGHT:
-			self.image = self.image_right
-		elif direction == self.DIR_DOWN:
-			self.image = self.image_down
-		elif direction == self.DIR_LEFT:
-			self.image = self.image_left
+		if self.images is not None:
+			self.image = self.images[direction]
 
 		if fix_position:
 			new_x = self.nearest(self.rect.left, 8) + 3
@@ -215,7 +206,7 @@ class Tank:
 		elif self.side == self.SIDE_PLAYER: # 玩家击中玩家
 			if not self.paralised:
 				self.setParalised()  # 瘫痪
-				self.timer_uuid_paralise = self.game.timer_pool.add(10000, self.resetParalised, 1)
+				self.timer_id_paralise = self.game.timer_pool.add(10000, self.resetParalised, 1)
 			return True
 
 	def setParalised(self):
@@ -224,12 +215,12 @@ class Tank:
 		cancel state with resetParalised()
 		"""
 		if self.state != self.STATE_ALIVE:  # 已经死了
-			self.game.timer_pool.destroy(self.timer_uuid_paralise)
+			self.game.timer_pool.destroy(self.timer_id_paralise)
 			return
 		self.paralised = True
 
 	def resetParalised(self):
 		if self.state != self.STATE_ALIVE:
-			self.game.timer_pool.destroy(self.timer_uuid_paralise)
+			self.game.timer_pool.destroy(self.timer_id_paralise)
 			return
 		self.paralised = False
\ No newline at end of file
@@ -1,12 +1,13 @@
 from model import QNetwork, CatEnv
-import cv2
-import glob
 import os
 import torch
 import shutil
 import random
+import threading
 import numpy as np
 from game import Game
+from inference import InferenceServer
+from recorder import VideoRecorder
 
 
 device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
@@ -40,21 +41,18 @@ class TestAgent():
             action_qvalues = self.qnet_local(state)
         return action_qvalues.argmax(dim=-1)[0].item()
 
+    def serve(self, max_batch_size=64, max_wait_ms=2.0):
+        """ InferenceServer over this agent's network, for playing many games at once """
+        return InferenceServer(self.qnet_local, device, max_batch_size, max_wait_ms)
+
 
 def test_game(env, agent):
     state, info = env.reset()
     actions, score = [], 0
 
-    # clear last output
-    folder_path = "outputs"
-    for filename in os.listdir(folder_path):
-        file_path = os.path.join(folder_path, filename)
-        if os.path.isfile(file_path):
-            os.remove(file_path)
-
     for t in range(1000):
         action = agent.act(state, eps=0)
-        next_state, reward, done, truncated, info = env.step(action, render=True)  # 保存渲染结果
+        next_state, reward, done, truncated, info = env.step(action, render=True)  # 渲染结果写入视频
         if truncated: 
             next_state, info = env.reset()
         state = next_state
@@ -67,27 +65,41 @@ def test_game(env, agent):
     print(f"score: {score}, actions: {categories}, {a_counts}")
 
 
-def gen_video():
-    imgfiles = glob.glob("outputs/*.jpg")
-    imgfiles.sort(key=lambda f: int("".join(filter(str.isdigit, f))))
-    print(len(imgfiles))
-
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    fps = 30
-
-    img = cv2.imread(imgfiles[0])
-    out = cv2.VideoWriter('tank-stage1.mp4', fourcc, fps, (img.shape[1], img.shape[0]))
+def evaluate(agent, n_games, max_t=1000):
+    """ Play n_games in parallel threads, their act() calls are batched by an InferenceServer
+    @return list of scores
+    """
+    server = agent.serve(max_batch_size=n_games)
+    scores = [0] * n_games
+
+    def play(i):
+        env = CatEnv(Game(render_mode='grid', headless=True))
+        state, info = env.reset()
+        for t in range(max_t):
+            next_state, reward, done, truncated, info = env.step(server.act(state))
+            if truncated:
+                next_state, info = env.reset()
+            state = next_state
+            scores[i] += reward
+            if done:
+                break
+
+    threads = [threading.Thread(target=play, args=(i,)) for i in range(n_games)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    server.close()
+    print(f"{n_games} games, avg score: {np.mean(scores):.2f}, avg batch: {server.n_requests/max(server.n_batches, 1):.1f}")
+    return scores
 
-    for f in imgfiles:
-        img = cv2.imread(f)
-        out.write(img)
-    out.release()
 
 import argparse
 def get_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--ckpt", type=str, help="model .pth file path")
     parser.add_argument("--seed", type=int, default=42, help="The random seed")
+    parser.add_argument("--games", type=int, default=1, help="Games to evaluate in parallel, >1 skips rendering")
     return parser.parse_args()
 
 if __name__ == "__main__":
@@ -97,17 +109,17 @@ if __name__ == "__main__":
     print(f"args: {args}")
     random.seed(args.seed)
 
-    _env = Game(render_mode='grid')
-
-    env = CatEnv(_env)
-    state, info = env.reset()
-
     agent = TestAgent(
         state_size=1377,
         action_size=6,
         ckpt=args.ckpt
     )
 
-    test_game(env, agent)
-    gen_video()
+    if args.games > 1:
+        evaluate(agent, args.games)
+    else:
+        # with: 出错或 Ctrl-C 时也会写完视频并结束编码线程
+        with VideoRecorder("tank-stage1.mp4", fps=30) as recorder:
+            env = CatEnv(Game(render_mode='grid'), recorder=recorder)
+            test_game(env, agent)
 
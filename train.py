@@ -2,10 +2,15 @@ import numpy as np
 import os
 from game import Game
 from model import CatEnv
+from vec_env import VectorGame, SubprocVectorGame
+from replay import ReplayBuffer, FrameReplayBuffer, PrioritizedReplayBuffer
 import matplotlib.pyplot as plt
 
+import copy
 import random
-from collections import namedtuple, deque
+import threading
+import time
+from collections import deque
 
 import torch
 import torch.nn.functional as F
@@ -15,25 +20,6 @@ from model import QNetwork
 device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
 print(f"using device: {device}")
 
-class ReplayBuffer():
-    def __init__(self, buffer_size, batch_size):
-        self.buffer_size = int(buffer_size)
-        self.batch_size = batch_size
-        self.buffer = deque(maxlen=self.buffer_size)
-    
-    def add(self, state, action, reward, next_state, done):
-        transition = (state, action, reward, next_state, 1-done)
-        self.buffer.append(transition)
-
-    def sample(self):
-        indices = random.choices(range(len(self.buffer)), k=self.batch_size)
-        transitions = [self.buffer[i] for i in indices]
-        return transitions
-    
-    def __len__(self):
-        return len(self.buffer)
-
-
 class Agent():
     def __init__(
         self, 
@@ -43,7 +29,9 @@ class Agent():
         gamma=0.99, 
         tau=1e-3, 
         buffer_size=2e4, 
-        update_interval=4
+        update_interval=4,
+        replay="uniform",
+        frame_size=1352
     ):
         self.action_size, self.batch_size = action_size, batch_size
         self.gamma = gamma  # discount factor
@@ -55,11 +43,20 @@ class Agent():
         self.qnet_target.eval()
         self.optimizer = torch.optim.Adam(self.qnet_local.parameters(), lr=5e-4)
         self.scheduler = torch.optim.lr_scheduler.StepLR(self.optimizer, step_size=1000, gamma=0.9)
-        self.memory = ReplayBuffer(buffer_size, batch_size)
+        # replay: uniform, frames (每个观测只存一次), prioritized
+        # frame_size: 状态开头按 uint8 存的网格帧长度, CatEnv 是 1352, 没有网格帧的状态用 0
+        self.prioritized = replay == "prioritized"
+        if replay == "frames":
+            self.memory = FrameReplayBuffer(buffer_size, batch_size, state_size, frame_size)
+        elif self.prioritized:
+            self.memory = PrioritizedReplayBuffer(buffer_size, batch_size, state_size, frame_size)
+        else:
+            self.memory = ReplayBuffer(buffer_size, batch_size, state_size, frame_size)
         self.t_step = 0
 
-    def step(self, state, action, reward, next_state, done):
-        self.memory.add(state, action, reward, next_state, done)
+    def step(self, state, action, reward, next_state, done, stream=0):
+        """ stream: which env the transition comes from, when several are interleaved """
+        self.memory.add(state, action, reward, next_state, done, stream)
         self.t_step = (self.t_step + 1) % self.update_interval
         if self.t_step == 0 and len(self.memory) > self.batch_size:
             self.learn()
@@ -75,15 +72,27 @@ class Agent():
         else:
             return random.choice(np.arange(self.action_size))
 
+    def act_batch(self, states, eps=0.):
+        """ Epsilon-greedy actions for a batch of states, one forward pass """
+        states = torch.from_numpy(np.asarray(states, dtype=np.float32)).to(device)
+        self.qnet_local.eval()
+        with torch.no_grad():
+            actions = self.qnet_local(states).argmax(dim=-1).cpu().numpy()
+        explore = np.random.random(len(actions)) < eps
+        actions[explore] = np.random.randint(self.action_size, size=explore.sum())
+        return actions
+
     def learn(self):
-        transitions = self.memory.sample()
-        states, actions, rewards, next_states, masks = zip(*transitions)
-        
-        states = torch.FloatTensor(np.array(states)).to(device)
-        actions = torch.LongTensor(np.array(actions)).to(device)
-        rewards = torch.FloatTensor(np.array(rewards)).to(device)
-        next_states = torch.FloatTensor(np.array(next_states)).to(device)
-        masks = torch.ByteTensor(np.array(masks)).to(device)
+        if self.prioritized:
+            states, actions, rewards, next_states, masks, weights, indices = self.memory.sample()
+        else:
+            states, actions, rewards, next_states, masks = self.memory.sample()
+
+        states = torch.from_numpy(states).to(device)
+        actions = torch.from_numpy(actions).to(device)
+        rewards = torch.from_numpy(rewards).to(device)
+        next_states = torch.from_numpy(next_states).to(device)
+        masks = torch.from_numpy(masks).to(device)
         
         # Compute Q-values and target values(discounted cumulated rewards)
         with torch.no_grad():
@@ -95,8 +104,14 @@ class Agent():
         pred_qvalues = self.qnet_local(states)
         pred_qvalues = pred_qvalues.gather(1, actions.unsqueeze(1)).squeeze(1)
 
-        loss = F.l1_loss(pred_qvalues, target_qvalues)
-        
+        if self.prioritized:  # importance-sampling 加权, 用 TD error 更新优先级
+            td_errors = target_qvalues - pred_qvalues
+            weights = torch.from_numpy(weights).to(device)
+            loss = (weights * td_errors.abs()).mean()
+            self.memory.update_priorities(indices, td_errors.detach().cpu().numpy())
+        else:
+            loss = F.l1_loss(pred_qvalues, target_qvalues)
+
         self.optimizer.zero_grad()
         loss.backward()
         self.optimizer.step()
@@ -146,6 +161,180 @@ def train_dqn(
     torch.save(agent.qnet_local.state_dict(), f'/kaggle/working/tank{i_episode}.pth')
 
 
+def train_dqn_vec(
+    agent, envs,
+    n_episodes=2000,
+    log_interval=100,
+    max_t=1000,
+    eps_start=1.0,
+    eps_end=0.001,
+    eps_decay=0.995
+):
+    """ Same as train_dqn, but steps all sub-environments of a VectorGame together """
+    scores_window = deque(maxlen=log_interval)
+    eps = eps_start
+    n_done = 0
+    episode_scores = np.zeros(len(envs))
+    episode_steps = np.zeros(len(envs), dtype=int)
+    states, infos = envs.reset()
+    while n_done < n_episodes:
+        actions = agent.act_batch(states, eps)
+        next_states, rewards, dones, truncateds, infos = envs.step(actions)
+        for i in range(len(envs)):
+            # 自动重开的子环境, 用结束前的最后一帧作为 next_state
+            next_state = infos[i].get("final_observation", next_states[i])
+            agent.step(states[i], actions[i], rewards[i], next_state, dones[i], stream=i)
+        states = next_states
+        episode_scores += rewards
+        episode_steps += 1
+
+        for i in np.flatnonzero(dones | (episode_steps >= max_t)):
+            if not dones[i]:  # max_t 到了, 手动重开
+                states[i] = envs.reset_one(i)
+            scores_window.append(episode_scores[i])
+            scores.append(episode_scores[i])
+            episode_scores[i], episode_steps[i] = 0, 0
+            eps = max(eps_end, eps_decay*eps)
+            n_done += 1
+            if n_done % log_interval == 0:
+                print(f'Episode {n_done}\tAvg Score: {np.mean(scores_window):.2f}')
+    torch.save(agent.qnet_local.state_dict(), f'/kaggle/working/tank{n_done}.pth')
+
+
+class LockedMemory():
+    """ Replay memory shared by actor threads and the learner, every call holds one lock """
+    def __init__(self, memory):
+        self.memory = memory
+        self.lock = threading.Lock()
+
+    def add(self, *transition, stream=0):
+        with self.lock:
+            self.memory.add(*transition, stream=stream)
+
+    def sample(self):
+        with self.lock:
+            return self.memory.sample()
+
+    def update_priorities(self, indices, td_errors):
+        with self.lock:
+            self.memory.update_priorities(indices, td_errors)
+
+    def __len__(self):
+        return len(self.memory)
+
+
+def train_async(
+    agent, env_fn,
+    n_actors=2,
+    n_episodes=2000,
+    log_interval=10,
+    max_t=1000,
+    sync_interval=50,
+    warmup=1000,
+    eps_start=1.0,
+    eps_end=0.001,
+    eps_decay=0.995
+):
+    """ Actor-learner training
+    Each actor thread plays its own env_fn() with a CPU copy of qnet_local, refreshed every
+    sync_interval updates, and pushes transitions into the shared replay memory. The learner
+    (this thread) calls agent.learn() once the memory holds warmup transitions, then at most once
+    per agent.update_interval new environment steps, the same replay ratio as Agent.step, so the
+    StepLR schedule follows environment steps. torch releases the GIL in forward and
+    backward passes, so simulation and gradient steps overlap.
+    log_interval: seconds between steps/s and updates/s reports
+    """
+    agent.memory = LockedMemory(agent.memory)
+    stop = threading.Event()
+    lock = threading.Lock()  # counters and scores
+    counters = {"steps": 0, "updates": 0, "episodes": 0}
+    scores_window = deque(maxlen=100)
+    published = {"version": 0, "weights": copy.deepcopy(agent.qnet_local).cpu().state_dict()}
+    errors = []  # exceptions raised in actor threads
+
+    def actor(env, index):
+        """ Thread target: a failing actor stops the whole run, its exception is raised by the learner """
+        try:
+            play(env, index)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    def play(env, index):
+        qnet = copy.deepcopy(agent.qnet_local).cpu()
+        qnet.eval()
+        version = -1
+        eps = eps_start
+        while not stop.is_set():
+            state, info = env.reset()
+            score = 0
+            for t in range(max_t):
+                if version != published["version"]:  # 同步学习者的最新参数
+                    version = published["version"]
+                    qnet.load_state_dict(published["weights"])
+                if random.random() > eps:
+                    with torch.no_grad():
+                        q = qnet(torch.from_numpy(np.asarray(state, dtype=np.float32)).unsqueeze(0))
+                    action = q.argmax(dim=-1)[0].item()
+                else:
+                    action = random.randrange(agent.action_size)
+                next_state, reward, done, truncated, info = env.step(action)
+                if truncated:
+                    next_state, info = env.reset()
+                agent.memory.add(state, action, reward, next_state, done, stream=index)
+                state = next_state
+                score += reward
+                with lock:
+                    counters["steps"] += 1
+                if done or stop.is_set():
+                    break
+            eps = max(eps_end, eps_decay*eps)
+            with lock:
+                scores_window.append(score)
+                scores.append(score)
+                counters["episodes"] += 1
+                if counters["episodes"] >= n_episodes:
+                    stop.set()
+
+    actors = [threading.Thread(target=actor, args=(env_fn(), i), daemon=True) for i in range(n_actors)]
+    for a in actors:
+        a.start()
+
+    last_time, last_steps, last_updates = time.time(), 0, 0
+    try:
+        while not stop.is_set() and any(a.is_alive() for a in actors):
+            with lock:
+                steps = counters["steps"]
+            # 预热之后, 每 update_interval 步环境最多更新一次, 学习者不会跑在采样前面
+            if len(agent.memory) >= max(warmup, agent.batch_size) and counters["updates"] < (steps - warmup) // agent.update_interval:
+                agent.learn()
+                counters["updates"] += 1
+                if counters["updates"] % sync_interval == 0:
+                    weights = {k: v.detach().cpu().clone() for k, v in agent.qnet_local.state_dict().items()}
+                    published["weights"], published["version"] = weights, published["version"] + 1
+            else:
+                time.sleep(0.001)
+
+            now = time.time()
+            if now - last_time >= log_interval:
+                with lock:
+                    steps, episodes = counters["steps"], counters["episodes"]
+                    avg = np.mean(scores_window) if scores_window else 0.
+                updates = counters["updates"]
+                print(f'Episode {episodes}\tAvg Score: {avg:.2f}\t'
+                      f'steps/s: {(steps-last_steps)/(now-last_time):.1f}\t'
+                      f'updates/s: {(updates-last_updates)/(now-last_time):.1f}')
+                last_time, last_steps, last_updates = now, steps, updates
+    finally:  # 学习者出错时也要停下 actor 线程
+        stop.set()
+        for a in actors:
+            a.join()
+        agent.memory = agent.memory.memory
+    if errors:
+        raise errors[0]
+    torch.save(agent.qnet_local.state_dict(), f'/kaggle/working/tank{counters["episodes"]}.pth')
+
+
 import argparse
 def get_args():
     parser = argparse.ArgumentParser()
@@ -154,6 +343,11 @@ def get_args():
     parser.add_argument("--batch_size", type=int, default=256, help="How many data to use together")
     parser.add_argument("--buffer_size", type=int, default=5e3, help="Replay memory buffer size")
     parser.add_argument("--update_interval", type=int, default=12, help="how many steps will cause an update")
+    parser.add_argument("--num_envs", type=int, default=1, help="How many games to step together")
+    parser.add_argument("--subproc", action="store_true", help="Run each game in its own worker process")
+    parser.add_argument("--actors", type=int, default=0, help="Actor threads for asynchronous training, 0 to train in sequence")
+    parser.add_argument("--warmup", type=int, default=1000, help="Transitions collected before asynchronous training starts learning")
+    parser.add_argument("--replay", type=str, default="uniform", choices=["uniform", "frames", "prioritized"], help="Replay memory type")
     return parser.parse_args()
 
 # python train.py --seed=1230 --episodes=4000 --batch_size=256
@@ -164,21 +358,35 @@ if __name__ == "__main__":
     args = get_args()
 
     random.seed(args.seed)
+    np.random.seed(args.seed)
     torch.manual_seed(args.seed)
 
-    _env = Game(render_mode='grid')
-    env = CatEnv(_env)
-    
+    if args.num_envs > 1 and args.subproc:
+        env = SubprocVectorGame(args.num_envs)
+    elif args.num_envs > 1:
+        env = VectorGame(args.num_envs, env_fn=lambda :CatEnv(Game(render_mode='grid', headless=True)))
+    else:
+        _env = Game(render_mode='grid', headless=True)
+        env = CatEnv(_env)
+
     scores = []  # 记录历史奖励
     agent = Agent(
         state_size=1377,
         action_size=6,
         batch_size=args.batch_size,
         buffer_size=args.buffer_size,
-        update_interval=args.update_interval
+        update_interval=args.update_interval,
+        replay=args.replay
     )
 
-    train_dqn(agent, env, n_episodes=args.episodes)
+    if args.actors > 0:
+        train_async(agent, lambda :CatEnv(Game(render_mode='grid', headless=True)), n_actors=args.actors, n_episodes=args.episodes, warmup=args.warmup)
+    elif args.num_envs > 1:
+        train_dqn_vec(agent, env, n_episodes=args.episodes)
+        if args.subproc:
+            env.close()
+    else:
+        train_dqn(agent, env, n_episodes=args.episodes)
 
     plt.figure(figsize=(8,3))
     plt.title(f"DQN - seed={args.seed}")
@@ -1,6 +1,8 @@
 
+import heapq
+
+import numpy as np
 import pygame
-import uuid
 
 
 class myRect(pygame.Rect):
@@ -9,77 +11,78 @@ class myRect(pygame.Rect):
 		pygame.Rect.__init__(self, left, top, width, height)
 		self.type = type
 
+	def __reduce__(self):
+		# pygame.Rect pickles as Rect(x, y, w, h), which would drop type
+		return (myRect, (self.left, self.top, self.width, self.height, self.type))
+
 
 class Timer(object):
+	""" 计时器, 按到期时间放在小顶堆里
+	add() returns an integer id, destroy() only drops the timer from self.timers,
+	its heap entry is skipped when it comes up.
+	"""
 	def __init__(self):
-		self.timers = []  # [dict, dict, ...]
+		self.now = 0      # total time passed, in ms
+		self.heap = []    # [(due, id), ...], ties fire in the order they were added
+		self.timers = {}  # id -> dict
+		self.next_id = 1
 
 	def add(self, interval, callback, repeat=-1):
 		# 增加一个计时器
-		options = {
+		timer_id = self.next_id
+		self.next_id += 1
+		due = self.now + interval
+		self.timers[timer_id] = {
 			"interval": interval,
 			"callback": callback,
 			"repeat": repeat,
 			"times": 0,
-			"time": 0,
-			"uuid": uuid.uuid4()
+			"due": due
 		}
-		self.timers.append(options)
-
-		return options["uuid"]  # 返回定时器的id，用于将来外部调用摧毁
+		heapq.heappush(self.heap, (due, timer_id))
+		return timer_id  # 返回定时器的id，用于将来外部调用摧毁
 
-	def destroy(self, uuid_nr):
+	def destroy(self, timer_id):
 		""" 依据 id 删除对应的计时器 """
-		for timer in self.timers:
-			if timer["uuid"] == uuid_nr:
-				self.timers.remove(timer)
-				break
+		self.timers.pop(timer_id, None)
+
+	def clear(self):
+		""" 删除所有计时器 """
+		self.heap.clear()
+		self.timers.clear()
 
 	def update(self, time_passed):
-		""" 更新一遍计时器 """
-		for timer in self.timers:
-			timer["time"] += time_passed
-			if timer["time"] <= timer["interval"]:
+		""" 更新一遍计时器, each timer fires at most once per update """
+		self.now += time_passed
+		rescheduled = []
+		while self.heap and self.heap[0][0] < self.now:
+			due, timer_id = heapq.heappop(self.heap)
+			timer = self.timers.get(timer_id)
+			if timer is None:  # already destroyed
 				continue
 			# 该计时器积累了一个固定周期
-
-			timer["time"] -= timer["interval"]
 			timer["times"] += 1  # 触发次数加一
 			if timer["repeat"] > -1 and timer["times"] == timer["repeat"]:
 				# 记录完指定次数，移除计时器
-				self.timers.remove(timer)
-			#try:
+				del self.timers[timer_id]
+			else:
+				timer["due"] = due + timer["interval"]
+				rescheduled.append(timer_id)
 			timer["callback"]()
-			# except:
-			# 	try: # 一旦 callback 出错，移除对应的计时器
-			# 		self.timers.remove(timer)
-			# 	except:
-			# 		pass
-
 
-import cmath
+		for timer_id in rescheduled:
+			timer = self.timers.get(timer_id)
+			if timer is not None:  # callback may have destroyed it
+				heapq.heappush(self.heap, (timer["due"], timer_id))
 
-def cartesian_to_polar(x, y):
-	"""Convert cartesian coordinates to polar coordinates."""
-	r = abs(complex(x, y))
-	phi = cmath.phase(complex(x, y))
-	return r, phi
 
-def get_relative_polar_coordinates(a, b, required_size=None, normalize=True):
-	"""Calculate the relative polar coordinates of b with respect to a."""
-	width, height = 416, 416
-	polar_coordinates = []
-	for point in b:
-		x, y = point[0], point[1]
-		dx, dy = x-a[0], y-a[1]
-		if normalize:
-			dx /= width
-			dy /= height
-		r, phi = cartesian_to_polar(dx, dy)
-		polar_coordinates.append([r, phi])
-	if required_size is not None:
-		while len(polar_coordinates)<required_size:
-			polar_coordinates.append([0, 0])
-		if len(polar_coordinates)>required_size:
-			polar_coordinates = polar_coordinates[:required_size]
-	return polar_coordinates
\ No newline at end of file
+def relative_polar(origins, points, normalize=True, size=(416, 416)):
+	"""Polar coordinates (r, phi) of points relative to origins, same as
+	abs/cmath.phase of complex(dx, dy) but for whole arrays.
+	origins: (..., 2), points: (..., K, 2)
+	@return r, phi with shape (..., K)
+	"""
+	d = np.asarray(points, dtype=np.float64) - np.asarray(origins, dtype=np.float64)[..., None, :]
+	if normalize:
+		d /= size
+	return np.hypot(d[..., 0], d[..., 1]), np.arctan2(d[..., 1], d[..., 0])
@@ -0,0 +1,229 @@
+import multiprocessing
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+from game import Game
+
+
+class VectorGame():
+	""" 同时运行 N 个独立的环境, 批量 reset/step
+	Observations, rewards and flags are stacked along a leading axis of size num_envs.
+	A sub-environment that reports done or truncated is reset automatically, its last
+	observation is kept in infos[i]["final_observation"].
+	"""
+	def __init__(self, num_envs, env_fn=None, render_mode="grid"):
+		"""
+		num_envs: number of sub-environments
+		env_fn: callable that returns a new environment (Game or CatEnv).
+			If none, Game(render_mode=render_mode) is used, headless unless render_mode is "rgb"
+		"""
+		if env_fn is None:
+			env_fn = lambda :Game(render_mode=render_mode, headless=render_mode != "rgb")
+		self.num_envs = num_envs
+		self.envs = [env_fn() for _ in range(num_envs)]
+
+	def reset(self):
+		""" Reset all sub-environments
+		@return (observations, infos)
+		"""
+		observations, infos = [], []
+		for env in self.envs:
+			obs, info = env.reset()
+			observations.append(obs)
+			infos.append(info)
+		return np.stack(observations), infos
+
+	def reset_one(self, index):
+		""" Reset a single sub-environment, e.g. when an episode hits max_t """
+		obs, _ = self.envs[index].reset()
+		return np.array(obs)  # 拷贝, 理由同 step
+
+	def step(self, actions):
+		""" Step every sub-environment with its own action
+		actions: sequence of num_envs ints
+		@return (observations, rewards, dones, truncateds, infos)
+		"""
+		assert len(actions) == self.num_envs, f"expected {self.num_envs} actions, got {len(actions)}"
+		observations, infos = [], []
+		rewards = np.zeros(self.num_envs, dtype=np.float32)
+		dones = np.zeros(self.num_envs, dtype=bool)
+		truncateds = np.zeros(self.num_envs, dtype=bool)
+
+		for i, (env, action) in enumerate(zip(self.envs, actions)):
+			obs, reward, done, truncated, info = env.step(int(action))
+			if done or truncated:  # 结束的子环境立刻重开
+				# rgb 观测是屏幕缓冲区的视图, reset 会重画它, 所以必须拷贝
+				info = dict(info, final_observation=np.array(obs))
+				obs, _ = env.reset()
+			observations.append(obs)
+			infos.append(info)
+			rewards[i], dones[i], truncateds[i] = reward, done, truncated
+
+		return np.stack(observations), rewards, dones, truncateds, infos
+
+	def feature(self):
+		""" Game.feature() of every sub-environment in one call, shape (num_envs, 25) """
+		games = [getattr(env, "env", env) for env in self.envs]  # CatEnv keeps its Game in .env
+		return Game.batch_feature(games)
+
+	def __len__(self):
+		return self.num_envs
+
+
+def _make_cat_env():
+	""" Default worker environment, same setup as train.py """
+	from model import CatEnv
+	return CatEnv(Game(render_mode="grid", headless=True))
+
+
+def _worker(index, remote, parent_remote, shm_names, shape, env_fn):
+	""" 子进程: 运行一个环境, 观测直接写入共享内存, 管道只传动作和奖励
+	Every reply is ("ok", result) or ("error", traceback), after an error the worker exits
+	"""
+	parent_remote.close()
+	blocks = [shared_memory.SharedMemory(name=name) for name in shm_names]
+	observations, final_observations = [np.ndarray(shape, dtype=np.float32, buffer=b.buf) for b in blocks]
+	try:
+		env = env_fn()
+		while True:
+			cmd, action = remote.recv()
+			if cmd == "step":
+				obs, reward, done, truncated, info = env.step(action)
+				if done or truncated:
+					final_observations[index] = obs.reshape(-1)  # Game 的网格观测是 (26, 26)
+					obs, _ = env.reset()
+				observations[index] = obs.reshape(-1)
+				remote.send(("ok", (reward, done, truncated)))
+			elif cmd == "reset":
+				obs, _ = env.reset()
+				observations[index] = obs.reshape(-1)
+				remote.send(("ok", None))
+			elif cmd == "close":
+				break
+	except KeyboardInterrupt:
+		pass
+	except Exception:
+		try:
+			remote.send(("error", traceback.format_exc()))
+		except (BrokenPipeError, ConnectionResetError):
+			pass
+	finally:
+		del observations, final_observations  # views must go before the blocks are closed
+		for b in blocks:
+			b.close()
+		remote.close()
+
+
+class SubprocVectorGame():
+	""" VectorGame with every sub-environment in its own process
+	Workers write observations into a shared (num_envs, obs_size) float32 block, only
+	actions, rewards and flags go over the pipes. Same reset/step interface as VectorGame.
+	An exception in a worker closes all workers, frees the shared memory and is raised
+	as RuntimeError with the worker's traceback.
+	"""
+	def __init__(self, num_envs, env_fn=None, obs_size=1377, start_method=None):
+		"""
+		env_fn: picklable callable returning a new environment, defaults to a headless CatEnv(Game(render_mode="grid"))
+		obs_size: flattened observation size of one environment
+		start_method: multiprocessing start method, e.g. "spawn". None uses the platform default
+		"""
+		if env_fn is None:
+			env_fn = _make_cat_env
+		self.num_envs = num_envs
+		self.shape = (num_envs, obs_size)
+		nbytes = int(np.prod(self.shape)) * np.dtype(np.float32).itemsize
+		self.blocks = [shared_memory.SharedMemory(create=True, size=nbytes) for _ in range(2)]
+		self.observations, self.final_observations = [
+			np.ndarray(self.shape, dtype=np.float32, buffer=b.buf) for b in self.blocks]
+
+		ctx = multiprocessing.get_context(start_method)
+		self.remotes, self.processes = [], []
+		for i in range(num_envs):
+			remote, work_remote = ctx.Pipe()
+			process = ctx.Process(
+				target=_worker,
+				args=(i, work_remote, remote, [b.name for b in self.blocks], self.shape, env_fn),
+				daemon=True
+			)
+			process.start()
+			work_remote.close()
+			self.remotes.append(remote)
+			self.processes.append(process)
+		self.closed = False
+
+	def reset(self):
+		""" Reset all sub-environments
+		@return (observations, infos)
+		"""
+		for i in range(self.num_envs):
+			self._send(i, ("reset", None))
+		for i in range(self.num_envs):
+			self._recv(i)
+		return self.observations.copy(), [{} for _ in range(self.num_envs)]
+
+	def reset_one(self, index):
+		""" Reset a single worker """
+		self._send(index, ("reset", None))
+		self._recv(index)
+		return self.observations[index].copy()
+
+	def step(self, actions):
+		""" Step all workers in parallel
+		@return (observations, rewards, dones, truncateds, infos)
+		"""
+		assert len(actions) == self.num_envs, f"expected {self.num_envs} actions, got {len(actions)}"
+		for i, action in enumerate(actions):
+			self._send(i, ("step", int(action)))
+		results = [self._recv(i) for i in range(self.num_envs)]
+		rewards = np.array([r[0] for r in results], dtype=np.float32)
+		dones = np.array([r[1] for r in results], dtype=bool)
+		truncateds = np.array([r[2] for r in results], dtype=bool)
+
+		infos = [{} for _ in range(self.num_envs)]
+		for i in np.flatnonzero(dones | truncateds):
+			infos[i]["final_observation"] = self.final_observations[i].copy()
+		return self.observations.copy(), rewards, dones, truncateds, infos
+
+	def _send(self, index, message):
+		try:
+			self.remotes[index].send(message)
+		except (BrokenPipeError, ConnectionResetError):
+			self._recv(index)  # 子进程已经退出, 读出它留下的异常
+			self._fail(index, "worker exited")
+
+	def _recv(self, index):
+		try:
+			status, result = self.remotes[index].recv()
+		except (EOFError, ConnectionResetError):
+			self._fail(index, "worker exited without a reply")
+		if status == "error":
+			self._fail(index, result)
+		return result
+
+	def _fail(self, index, message):
+		""" Shut everything down and raise, so the shared memory does not leak """
+		self.close()
+		raise RuntimeError(f"worker {index} failed:\n{message}")
+
+	def close(self):
+		""" Stop workers and free the shared memory """
+		if self.closed:
+			return
+		self.closed = True
+		try:
+			for remote in self.remotes:
+				try:
+					remote.send(("close", None))
+				except (BrokenPipeError, EOFError, ConnectionResetError):  # 子进程已经退出
+					pass
+			for process in self.processes:
+				process.join()
+		finally:  # 共享内存无论如何都要释放
+			del self.observations, self.final_observations
+			for b in self.blocks:
+				b.close()
+				b.unlink()
+
+	def __len__(self):
+		return self.num_envs